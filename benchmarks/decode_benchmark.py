@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+# @Brief Micro-benchmark of the full registers map decode (40001 -> 40082).
+#        Enum constructors per field against the codec tables compiled in koolnova/const.py.
+
+import os,sys
+import argparse
+import random
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "custom_components", "koolnova_bms"))
+
+from koolnova import const
+
+def get_commandline() -> argparse.Namespace:
+    """ Read and validate command line arguments.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark koolnova registers decode.")
+    parser.add_argument("--number", help="decodes per run, default is 10000", type=int, default=10000)
+    parser.add_argument("--repeat", help="runs, the best one is kept, default is 5", type=int, default=5)
+    args = parser.parse_args()
+    return args
+
+def registers_map() -> list:
+    """ Build a registers map with all areas registered.
+    """
+    regs = []
+    for _ in range(const.NB_ZONE_MAX):
+        regs += [0b10 | random.randint(0, 1),
+                    (random.randint(0, 4) << 4) | random.choice((0, 1, 2, 4, 5, 6)),
+                    random.randint(30, 70),
+                    random.randint(0, 100)]
+    regs += [random.randint(0, 15) for _ in range(const.NUM_OF_ENGINES)]
+    regs += [random.randint(30, 60) for _ in range(const.NUM_OF_ENGINES)]
+    regs += [random.randint(1, 4) for _ in range(const.NUM_OF_ENGINES)]
+    regs += [0, 49, 3, 0, 1, 2]
+    return regs
+
+def decode_enums(regs:list) -> list:
+    """ Decode with one Enum construction per field.
+    """
+    _decoded = []
+    for idx in range(0, const.NB_ZONE_MAX * const.NUM_REG_PER_ZONE, const.NUM_REG_PER_ZONE):
+        _decoded.append((const.ZoneState(regs[idx] & 0b01),
+                            const.ZoneRegister((regs[idx] >> 1) & 0b1),
+                            const.ZoneFanMode((regs[idx + 1] & 0xF0) >> 4),
+                            const.ZoneClimMode(regs[idx + 1] & 0x0F)))
+    for idx in range(const.NUM_OF_ENGINES):
+        _decoded.append(const.FlowEngine(regs[const.REG_START_FLOW_STATE_ENGINE + idx]))
+    _decoded.append((const.GlobalMode(regs[const.REG_GLOBAL_MODE]),
+                        const.Efficiency(regs[const.REG_EFFICIENCY]),
+                        const.SysState(regs[const.REG_SYS_STATE])))
+    return _decoded
+
+def decode_codecs(regs:list) -> list:
+    """ Decode with the codec tables.
+    """
+    _decoded = []
+    for idx in range(0, const.NB_ZONE_MAX * const.NUM_REG_PER_ZONE, const.NUM_REG_PER_ZONE):
+        _decoded.append(const.ZONE_LOCK_CODEC.decode(regs[idx])
+                            + const.ZONE_STATE_AND_FLOW_CODEC.decode(regs[idx + 1]))
+    for idx in range(const.NUM_OF_ENGINES):
+        _decoded.append(const.FLOW_ENGINE_CODEC.decode(regs[const.REG_START_FLOW_STATE_ENGINE + idx])[0])
+    _decoded.append((const.GLOBAL_MODE_CODEC.decode(regs[const.REG_GLOBAL_MODE])[0],
+                        const.EFFICIENCY_CODEC.decode(regs[const.REG_EFFICIENCY])[0],
+                        const.SYS_STATE_CODEC.decode(regs[const.REG_SYS_STATE])[0]))
+    return _decoded
+
+def main() -> None:
+    """ Run both decoders on the same registers map.
+    """
+    args = get_commandline()
+    regs = registers_map()
+    if decode_enums(regs) != decode_codecs(regs):
+        sys.exit("Decoders disagree")
+    results = {}
+    for name, decode in (("enums", decode_enums), ("codecs", decode_codecs)):
+        best = min(timeit.repeat(lambda: decode(regs), number=args.number, repeat=args.repeat))
+        results[name] = best
+        print("{:<8} {:8.2f} us per full map decode".format(name, best / args.number * 1e6))
+    print("speedup  {:8.2f}x".format(results["enums"] / results["codecs"]))
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,19 @@ import logging
 
 from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers.storage import Store
 
-from .koolnova.device import Koolnova
+from .koolnova.device import Koolnova, ClientNotConnectedError
+from .koolnova.const import DEFAULT_FRAME_GAP, DEFAULT_PIPELINE_DEPTH
 
-from .const import DOMAIN, PLATFORMS
+from .const import (
+    DOMAIN,
+    PLATFORMS,
+    DEFAULT_POLL_MIN,
+    DEFAULT_POLL_MAX,
+    STORAGE_VERSION,
+)
 
 from .coordinator import KoolnovaCoordinator
 
@@ -22,6 +31,7 @@ async def async_setup_entry(hass: HomeAssistant,
     debug:bool = entry.data['Debug']
     timeout:int = entry.data['Timeout']
     name: str = entry.data['Name']
+    frame_gap: float = entry.data.get('Frame_gap', DEFAULT_FRAME_GAP)
     if entry.data['Mode'] == 'Modbus RTU':
         port: str = entry.data['Device']
         addr: int = entry.data['Address']
@@ -38,7 +48,8 @@ async def async_setup_entry(hass: HomeAssistant,
                             baudrate=baudrate,
                             parity=parity,
                             bytesize=bytesize,
-                            stopbits=stopbits)
+                            stopbits=stopbits,
+                            frame_gap=frame_gap)
     elif entry.data['Mode'] == 'Modbus TCP':
         port:int = entry.data['Port']
         addr:str = entry.data['Address']
@@ -55,37 +66,96 @@ async def async_setup_entry(hass: HomeAssistant,
                             modbus=modbus,
                             retries=retries,
                             reco_delay_min=reco_delay_min,
-                            reco_delay_max=reco_delay_max)
+                            reco_delay_max=reco_delay_max,
+                            pipeline_depth=entry.data.get('Pipeline_depth', DEFAULT_PIPELINE_DEPTH),
+                            frame_gap=frame_gap)
+    elif entry.data['Mode'] == 'Modbus RTU over TCP':
+        device = Koolnova(mode=entry.data['Mode'],
+                            name=name,
+                            timeout=timeout,
+                            debug=debug,
+                            port=entry.data['Port'],
+                            addr=entry.data['Address'],
+                            modbus=entry.data['Modbus'],
+                            retries=entry.data['Retries'],
+                            reco_delay_min=entry.data['Reconnect_delay_min'],
+                            reco_delay_max=entry.data['Reconnect_delay_max'],
+                            baudrate=int(entry.data['Baudrate']),
+                            parity=entry.data['Parity'][0],
+                            bytesize=entry.data['Sizebyte'],
+                            stopbits=entry.data['Stopbits'],
+                            frame_gap=frame_gap)
     else:
         _LOGGER.error("Integration initialisation failed (Mode unknown)")
         return False
+    store = Store(hass, STORAGE_VERSION, "{}.{}".format(DOMAIN, entry.entry_id))
     try:
-        # connect to modbus client
-        ret = await device.async_connect()
-        if not ret:
-            _LOGGER.error("Something went wrong when connecting to modbus ...")
-            return False
-        # update attributes
-        ret = await device.async_update()
-        if not ret:
-            _LOGGER.error("Something went wrong when updating datas ...")
-            return False
+        restored = await store.async_load()
+        if restored and device.journal.load(restored.get('journal', [])) and len(device.journal):
+            _LOGGER.debug("{} journaled write(s) restored".format(len(device.journal)))
+        if restored and device.restore(restored.get('registers')):
+            # entities come up with the last known state, confirmed by the first poll
+            _LOGGER.debug("Last known state restored")
+        else:
+            restored = None
+            # connect to modbus client
+            try:
+                await device.async_connect()
+            except ClientNotConnectedError as e:
+                # nothing known about the controller yet: let HA retry the setup later
+                device.disconnect()
+                raise ConfigEntryNotReady("Something went wrong when connecting to modbus ...") from e
+            # update attributes (system, engines and areas) from one read of the registers map
+            ret = await device.async_update()
+            if not ret:
+                _LOGGER.error("Something went wrong when updating datas ...")
+                device.disconnect()
+                return False
         # record each area in device
         _LOGGER.debug("Koolnova areas: {}".format(entry.data['areas']))
         for area in entry.data['areas']:
             await device.async_add_manual_registered_area(name=area['Name'], 
                                                     id_zone=area['Area_id'])
-        hass.data[DOMAIN]['device'] = device
-        coordinator = KoolnovaCoordinator(hass, device)
-        hass.data[DOMAIN]['coordinator'] = coordinator
+        coordinator = KoolnovaCoordinator(hass,
+                                            device,
+                                            entry,
+                                            store=store,
+                                            poll_min=entry.data.get('Poll_min', DEFAULT_POLL_MIN),
+                                            poll_max=entry.data.get('Poll_max', DEFAULT_POLL_MAX))
+        # entities start from the restored or first polled state, before any refresh
+        coordinator.data = device.data
+        # one device and one coordinator per config entry (controller),
+        # controllers sharing a bus are arbitrated by the bus scheduler
+        hass.data[DOMAIN][entry.entry_id] = {'device': device,
+                                                'coordinator': coordinator}
+        if restored:
+            entry.async_create_background_task(hass,
+                                                _async_first_poll(device, coordinator),
+                                                "koolnova first poll")
+    except ConfigEntryNotReady:
+        raise
     except Exception as e:
         _LOGGER.exception("Something went wrong ... {}".format(e))
+        # no platform without its device and coordinator: HA retries the setup later
+        hass.data[DOMAIN].pop(entry.entry_id, None)
+        device.disconnect()
+        raise ConfigEntryNotReady("Koolnova initialisation failed ({})".format(e)) from e
 
     # Propagation du configEntry à toutes les plateformes déclarées dans notre intégration
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
     return True
 
+async def _async_first_poll(device: Koolnova,
+                            coordinator: KoolnovaCoordinator) -> None:
+    """ Connect and confirm the restored state with a live poll """
+    try:
+        await device.async_connect()
+    except Exception as e:
+        # reconnected in the background, the coordinator refreshes when the link is up
+        _LOGGER.warning("Modbus not connected, retrying in the background ... {}".format(e))
+    await coordinator.async_refresh()
+
 async def async_unload_entry(hass: HomeAssistant,
                             entry: ConfigEntry) -> bool:
     """ Unload a config entry. """
@@ -93,12 +163,21 @@ async def async_unload_entry(hass: HomeAssistant,
     # needs to unload itself, and remove callbacks
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     _LOGGER.debug("Unload entries: {}".format(unload_ok))
+    if unload_ok:
+        entry_data = hass.data[DOMAIN].pop(entry.entry_id, None)
+        if entry_data is not None:
+            # the delayed save is written now, not 30s later over a removed entry
+            await entry_data['coordinator'].async_close_store()
+            # stops the background reconnection, closes the socket or serial port with the last controller
+            entry_data['device'].disconnect()
     return unload_ok
 
 async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
     """ Handle removal of an entry """
     _LOGGER.debug("Remove entry")
-    if hass.data[DOMAIN]:
-        device = hass.data[DOMAIN]['device']
-        if device.connected():
-            device.disconnect()
+    entry_data = hass.data.get(DOMAIN, {}).pop(entry.entry_id, None)
+    if entry_data is not None:
+        # still loaded: no pending save of the coordinator may write the file back
+        await entry_data['coordinator'].async_close_store()
+        entry_data['device'].disconnect()
+    await Store(hass, STORAGE_VERSION, "{}.{}".format(DOMAIN, entry.entry_id)).async_remove()
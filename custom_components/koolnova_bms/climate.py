@@ -32,7 +32,7 @@ from .const import (
     HVAC_TRANSLATION,
 )
 
-from .coordinator import KoolnovaCoordinator
+from .coordinator import KoolnovaCoordinator, KoolnovaEntity
 
 from homeassistant.const import (
     ATTR_TEMPERATURE,
@@ -44,6 +44,7 @@ from .koolnova.const import (
     MIN_TEMP_ORDER,
     MAX_TEMP_ORDER,
     STEP_TEMP_ORDER,
+    OWNER_ZONE,
     SysState,
     ZoneState,
     ZoneClimMode,
@@ -59,14 +60,14 @@ async def async_setup_entry(hass: HomeAssistant,
     """Setup switch entries"""
 
     entities = []
-    coordinator = hass.data[DOMAIN]["coordinator"]
-    device = hass.data[DOMAIN]["device"]
+    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
+    device = hass.data[DOMAIN][entry.entry_id]["device"]
 
     for area in device.areas:
         entities.append(AreaClimateEntity(coordinator, device, area))
     async_add_entities(entities)
 
-class AreaClimateEntity(CoordinatorEntity, ClimateEntity):
+class AreaClimateEntity(KoolnovaEntity, ClimateEntity):
     """ Reperesentation of a climate entity """
     # pylint: disable = too-many-instance-attributes
 
@@ -90,8 +91,8 @@ class AreaClimateEntity(CoordinatorEntity, ClimateEntity):
                 area: Area, # pylint: disable=unused-argument
                 ) -> None:
         """ Class constructor """
-        super().__init__(coordinator)
-        self._device = device
+        # notified only when the area registers change
+        super().__init__(coordinator, device, (OWNER_ZONE, area.id_zone))
         self._area = area
         self._attr_name = f"{self._device.name} {self._area.name}"
         self._attr_device_info = self._device.device_info
@@ -123,7 +124,7 @@ class AreaClimateEntity(CoordinatorEntity, ClimateEntity):
                 _LOGGER.error("Error sending target temperature for area id {}".format(self._area.id_zone))
         else:
             _LOGGER.warning("Target temperature not defined for climate id {}".format(self._area.id_zone))
-        await self.coordinator.async_request_refresh()
+        await self.coordinator.async_commit()
 
     async def async_set_fan_mode(self,
                                     fan_mode:str,
@@ -138,7 +139,7 @@ class AreaClimateEntity(CoordinatorEntity, ClimateEntity):
                                                             mode = ZoneFanMode(opt))
         if not ret:
             _LOGGER.exception("Error setting new fan value for area id {}".format(self._area.id_zone))
-        await self.coordinator.async_request_refresh()
+        await self.coordinator.async_commit()
 
     async def async_set_hvac_mode(self,
                                     hvac_mode:HVACMode,
@@ -154,7 +155,7 @@ class AreaClimateEntity(CoordinatorEntity, ClimateEntity):
                                                             mode = ZoneClimMode(opt))
         if not ret:
             _LOGGER.exception("Error setting new hvac value for area id {}".format(self._area.id_zone))
-        await self.coordinator.async_request_refresh()
+        await self.coordinator.async_commit()
         
     async def async_turn_off(self) -> None:
         """Turn the entity off."""
@@ -162,7 +163,7 @@ class AreaClimateEntity(CoordinatorEntity, ClimateEntity):
         ret = await self._device.async_set_area_off(zone_id = self._area.id_zone)
         if not ret:
             _LOGGER.exception("Error setting off HVAC for area id {}".format(self._area.id_zone))
-        await self.coordinator.async_request_refresh()
+        await self.coordinator.async_commit()
 
     async def async_turn_on(self) -> None:
         """Turn the entity on."""
@@ -170,25 +171,28 @@ class AreaClimateEntity(CoordinatorEntity, ClimateEntity):
         ret = await self._device.async_set_area_on(zone_id = self._area.id_zone)
         if not ret:
             _LOGGER.exception("Error setting on HVAC for area id {}".format(self._area.id_zone))
-        await self.coordinator.async_request_refresh()
+        await self.coordinator.async_commit()
 
-    @callback
-    def _handle_coordinator_update(self) -> None:
+    def _state(self) -> tuple:
+        """ values shown by the entity """
+        return (self._attr_current_temperature, self._attr_target_temperature,
+                self._attr_hvac_mode, self._attr_fan_mode)
+
+    def _update_from_data(self, data:dict) -> None:
         """ Handle updated data from the coordinator """
-        for _cur_area in self.coordinator.data['areas']:
-            if _cur_area.id_zone == self._area.id_zone:
-                _LOGGER.debug("[UPDATE] [Climate {}] temp:{} - target:{} - state: {} - hvac:{} - fan:{}".format(_cur_area.id_zone,
-                                                                                                        _cur_area.real_temp,
-                                                                                                        _cur_area.order_temp,
-                                                                                                        _cur_area.state,
-                                                                                                        _cur_area.clim_mode,
-                                                                                                        _cur_area.fan_mode))
-                self._area = _cur_area
-                self._attr_current_temperature = _cur_area.real_temp
-                self._attr_target_temperature = _cur_area.order_temp
-                if _cur_area.state == ZoneState.STATE_OFF:
-                    self._attr_hvac_mode = HVACMode.OFF
-                else:
-                    self._attr_hvac_mode = HVAC_TRANSLATION[int(_cur_area.clim_mode)]
-                self._attr_fan_mode = FAN_TRANSLATION[int(_cur_area.fan_mode)]
-        self.async_write_ha_state()
+        _cur_area = data['areas_by_id'].get(self._area.id_zone)
+        if _cur_area is not None:
+            _LOGGER.debug("[UPDATE] [Climate {}] temp:{} - target:{} - state: {} - hvac:{} - fan:{}".format(_cur_area.id_zone,
+                                                                                                    _cur_area.real_temp,
+                                                                                                    _cur_area.order_temp,
+                                                                                                    _cur_area.state,
+                                                                                                    _cur_area.clim_mode,
+                                                                                                    _cur_area.fan_mode))
+            self._area = _cur_area
+            self._attr_current_temperature = _cur_area.real_temp
+            self._attr_target_temperature = _cur_area.order_temp
+            if _cur_area.state == ZoneState.STATE_OFF:
+                self._attr_hvac_mode = HVACMode.OFF
+            else:
+                self._attr_hvac_mode = HVAC_TRANSLATION[int(_cur_area.clim_mode)]
+            self._attr_fan_mode = FAN_TRANSLATION[int(_cur_area.fan_mode)]
@@ -8,13 +8,19 @@ import homeassistant.helpers.config_validation as cv
 from homeassistant.config_entries import ConfigFlow
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.const import CONF_BASE
-from .const import DOMAIN, CONF_NAME
+from .const import (
+    DOMAIN,
+    CONF_NAME,
+    DEFAULT_POLL_MIN,
+    DEFAULT_POLL_MAX,
+)
 
 from .koolnova.operations import Operations
 from .koolnova.const import (
     DEFAULT_MODE,
     DEFAULT_TCP_ADDR,
     DEFAULT_TCP_PORT,
+    DEFAULT_RTU_TCP_PORT,
     DEFAULT_TCP_RETRIES,
     DEFAULT_TCP_RECO_DELAY,
     DEFAULT_TCP_RECO_DELAY_MAX,
@@ -23,6 +29,9 @@ from .koolnova.const import (
     DEFAULT_PARITY,
     DEFAULT_STOPBITS,
     DEFAULT_BYTESIZE,
+    DEFAULT_FRAME_GAP,
+    DEFAULT_PIPELINE_DEPTH,
+    MAX_PIPELINE_DEPTH,
     NB_ZONE_MAX
 )
 
@@ -36,10 +45,18 @@ class KoolnovaConfigFlow(ConfigFlow, domain=DOMAIN):
     # La version de notre configFlow va permettre de migrer les entités
     # vers une version plus récente en cas de changement
     VERSION = 1
-    # le dictionnaire qui va recevoir tous les user_input. On le vide au démarrage
-    _user_inputs: dict = {}
     _conn = None
 
+    def __init__(self) -> None:
+        """ Class constructor """
+        # le dictionnaire qui va recevoir tous les user_input, propre à chaque config flow
+        # (plusieurs contrôleurs Koolnova peuvent être configurés)
+        self._user_inputs: dict = {}
+
+    def _name_configured(self, name: str) -> bool:
+        """ test if a controller is already configured with this name """
+        return any(entry.data.get("Name") == name for entry in self._async_current_entries())
+
     async def async_step_user(self,
                             user_input: dict | None = None) -> FlowResult:
         """ Gestion de l'étape 'user'.
@@ -50,7 +67,7 @@ class KoolnovaConfigFlow(ConfigFlow, domain=DOMAIN):
         errors = {}
         user_form = vol.Schema( #pylint: disable=invalid-name
             {
-                vol.Required("Mode", default=str(DEFAULT_MODE)): vol.In(["Modbus TCP", "Modbus RTU"])
+                vol.Required("Mode", default=str(DEFAULT_MODE)): vol.In(["Modbus TCP", "Modbus RTU", "Modbus RTU over TCP"])
             }
         )
 
@@ -62,6 +79,9 @@ class KoolnovaConfigFlow(ConfigFlow, domain=DOMAIN):
             elif user_input["Mode"] == "Modbus TCP":
                 # go to next step
                 return await self.async_step_tcp()
+            elif user_input["Mode"] == "Modbus RTU over TCP":
+                # go to next step
+                return await self.async_step_rtu_tcp()
             else:
                 _LOGGER.warning("no choice :p")
 
@@ -88,11 +108,21 @@ class KoolnovaConfigFlow(ConfigFlow, domain=DOMAIN):
                 vol.Required("Reconnect_delay_min", default=DEFAULT_TCP_RECO_DELAY): vol.Coerce(float),
                 vol.Required("Reconnect_delay_max", default=DEFAULT_TCP_RECO_DELAY_MAX): vol.Coerce(float),
                 vol.Required("Timeout", default=5): vol.Coerce(int),
+                vol.Optional("Pipeline_depth", default=DEFAULT_PIPELINE_DEPTH): vol.All(vol.Coerce(int),
+                                                                                        vol.Range(min=1, max=MAX_PIPELINE_DEPTH)),
+                vol.Optional("Frame_gap", default=DEFAULT_FRAME_GAP): vol.Coerce(float),
+                vol.Optional("Poll_min", default=DEFAULT_POLL_MIN): vol.Coerce(int),
+                vol.Optional("Poll_max", default=DEFAULT_POLL_MAX): vol.Coerce(int),
                 vol.Optional("Debug", default=False): cv.boolean
             }
         )
         if user_input:
             _LOGGER.debug("[config_flow|tcp] values received: {}".format(user_input))
+            if self._name_configured(user_input["Name"]):
+                errors["Name"] = "name_already_configured"
+                return self.async_show_form(step_id="tcp",
+                                            data_schema=tcp_form,
+                                            errors=errors)
             self._user_inputs.update(user_input)
             self._conn = Operations(mode="Modbus TCP",
                                     timeout=self._user_inputs["Timeout"],
@@ -102,10 +132,14 @@ class KoolnovaConfigFlow(ConfigFlow, domain=DOMAIN):
                                     modbus=self._user_inputs["Modbus"],
                                     retries=self._user_inputs["Retries"],
                                     reco_delay_min=self._user_inputs["Reconnect_delay_min"],
-                                    reco_delay_max=self._user_inputs["Reconnect_delay_max"])
+                                    reco_delay_max=self._user_inputs["Reconnect_delay_max"],
+                                    pipeline_depth=self._user_inputs["Pipeline_depth"],
+                                    frame_gap=self._user_inputs["Frame_gap"])
             try:
                 await self._conn.async_connect()
                 if not self._conn.connected():
+                    # stop the background reconnection of the test connection
+                    self._conn.disconnect()
                     raise CannotConnectError(reason="Client Modbus TCP not connected")
                 _LOGGER.debug("test communication with koolnova system")
                 ret, _ = await self._conn.async_system_status()
@@ -128,6 +162,83 @@ class KoolnovaConfigFlow(ConfigFlow, domain=DOMAIN):
                                     data_schema=tcp_form,
                                     errors=errors)
 
+    async def async_step_rtu_tcp(self,
+                                user_input: dict | None = None) -> FlowResult:
+        """ Gestion de l'étape 'rtu_tcp' (trames RTU transportées sur TCP par la passerelle).
+            Cette méthode est appelée 2 fois:
+            1. 1ere fois sans user_input -> Affichage du formulaire de configuration
+            2. 2eme fois avec les données saisies par l'utilisateur dans user_input -> Sauvegarde des données saisies 
+        """
+        errors = {}
+        rtu_tcp_form = vol.Schema( #pylint: disable=invalid-name
+            {
+                vol.Required("Name", default="koolnova"): vol.Coerce(str),
+                vol.Required("Modbus", default=DEFAULT_ADDR): vol.Coerce(int),
+                vol.Required("Address", default=DEFAULT_TCP_ADDR): vol.Coerce(str),
+                vol.Required("Port", default=DEFAULT_RTU_TCP_PORT): vol.Coerce(int),
+                vol.Required("Baudrate", default=str(DEFAULT_BAUDRATE)): vol.In(["9600", "19200"]),
+                vol.Required("Sizebyte", default=DEFAULT_BYTESIZE): vol.Coerce(int),
+                vol.Required("Parity", default="EVEN"): vol.In(["EVEN", "NONE"]),
+                vol.Required("Stopbits", default=DEFAULT_STOPBITS): vol.Coerce(int),
+                vol.Required("Retries", default=DEFAULT_TCP_RETRIES): vol.Coerce(int),
+                vol.Required("Reconnect_delay_min", default=DEFAULT_TCP_RECO_DELAY): vol.Coerce(float),
+                vol.Required("Reconnect_delay_max", default=DEFAULT_TCP_RECO_DELAY_MAX): vol.Coerce(float),
+                vol.Required("Timeout", default=5): vol.Coerce(int),
+                vol.Optional("Frame_gap", default=DEFAULT_FRAME_GAP): vol.Coerce(float),
+                vol.Optional("Poll_min", default=DEFAULT_POLL_MIN): vol.Coerce(int),
+                vol.Optional("Poll_max", default=DEFAULT_POLL_MAX): vol.Coerce(int),
+                vol.Optional("Debug", default=False): cv.boolean
+            }
+        )
+        if user_input:
+            _LOGGER.debug("[config_flow|rtu_tcp] values received: {}".format(user_input))
+            if self._name_configured(user_input["Name"]):
+                errors["Name"] = "name_already_configured"
+                return self.async_show_form(step_id="rtu_tcp",
+                                            data_schema=rtu_tcp_form,
+                                            errors=errors)
+            self._user_inputs.update(user_input)
+            self._conn = Operations(mode="Modbus RTU over TCP",
+                                    timeout=self._user_inputs["Timeout"],
+                                    debug=self._user_inputs["Debug"],
+                                    addr=self._user_inputs["Address"],
+                                    port=self._user_inputs["Port"],
+                                    modbus=self._user_inputs["Modbus"],
+                                    retries=self._user_inputs["Retries"],
+                                    reco_delay_min=self._user_inputs["Reconnect_delay_min"],
+                                    reco_delay_max=self._user_inputs["Reconnect_delay_max"],
+                                    baudrate=int(self._user_inputs["Baudrate"]),
+                                    parity=self._user_inputs["Parity"][0],
+                                    stopbits=self._user_inputs["Stopbits"],
+                                    bytesize=self._user_inputs["Sizebyte"],
+                                    frame_gap=self._user_inputs["Frame_gap"])
+            try:
+                await self._conn.async_connect()
+                if not self._conn.connected():
+                    # stop the background reconnection of the test connection
+                    self._conn.disconnect()
+                    raise CannotConnectError(reason="Client Modbus RTU over TCP not connected")
+                _LOGGER.debug("test communication with koolnova system")
+                ret, _ = await self._conn.async_system_status()
+                if not ret:
+                    self._conn.disconnect()
+                    raise CannotConnectError(reason="Communication error")
+                self._conn.disconnect()
+
+                self._user_inputs["areas"] = []
+                # go to next step
+                return await self.async_step_areas()
+            except CannotConnectError:
+                _LOGGER.exception("Cannot connect to koolnova system")
+                errors[CONF_BASE] = "cannot_connect"
+            except Exception as e:
+                _LOGGER.exception("Config Flow generic error")
+
+        # first call or error
+        return self.async_show_form(step_id="rtu_tcp", 
+                                    data_schema=rtu_tcp_form,
+                                    errors=errors)
+
     async def async_step_rtu(self, 
                             user_input: dict | None = None) -> FlowResult:
         """ Gestion de l'étape 'rtu'.
@@ -146,12 +257,20 @@ class KoolnovaConfigFlow(ConfigFlow, domain=DOMAIN):
                 vol.Required("Parity", default="EVEN"): vol.In(["EVEN", "NONE"]),
                 vol.Required("Stopbits", default=DEFAULT_STOPBITS): vol.Coerce(int),
                 vol.Required("Timeout", default=5): vol.Coerce(int),
+                vol.Optional("Frame_gap", default=DEFAULT_FRAME_GAP): vol.Coerce(float),
+                vol.Optional("Poll_min", default=DEFAULT_POLL_MIN): vol.Coerce(int),
+                vol.Optional("Poll_max", default=DEFAULT_POLL_MAX): vol.Coerce(int),
                 vol.Optional("Debug", default=False): cv.boolean
             }
         )
 
         if user_input:
             _LOGGER.debug("[config_flow|rtu] values received: {}".format(user_input))
+            if self._name_configured(user_input["Name"]):
+                errors["Name"] = "name_already_configured"
+                return self.async_show_form(step_id="rtu",
+                                            data_schema=rtu_form,
+                                            errors=errors)
             # Second call; On memorise les données dans le dictionnaire
             self._user_inputs.update(user_input)
             self._conn = Operations(mode="Modbus RTU",
@@ -162,10 +281,13 @@ class KoolnovaConfigFlow(ConfigFlow, domain=DOMAIN):
                                     baudrate=int(self._user_inputs["Baudrate"]),
                                     parity=self._user_inputs["Parity"][0],
                                     stopbits=self._user_inputs["Stopbits"],
-                                    bytesize=self._user_inputs["Sizebyte"])
+                                    bytesize=self._user_inputs["Sizebyte"],
+                                    frame_gap=self._user_inputs["Frame_gap"])
             try:
                 await self._conn.async_connect()
                 if not self._conn.connected():
+                    # stop the background reconnection of the test connection
+                    self._conn.disconnect()
                     raise CannotConnectError(reason="Client Modbus RTU not connected")
                 #_LOGGER.debug("test communication with koolnova system")
                 ret, _ = await self._conn.async_system_status()
@@ -225,14 +347,12 @@ class KoolnovaConfigFlow(ConfigFlow, domain=DOMAIN):
                         # test if area is configured into koolnova system 
                         ret, _ = await self._conn.async_area_registered(user_input["Area_id"])
                         if not ret:
-                            self._conn.disconnect()
                             raise AreaNotRegistredError(reason="Area Id is not registred")
                     
-                        self._conn.disconnect()
                         # Update dict
                         self._user_inputs["areas"].append(user_input)
                         # Create entities
-                        return self.async_create_entry(title=CONF_NAME, 
+                        return self.async_create_entry(title="{} ({})".format(CONF_NAME, self._user_inputs["Name"]), 
                                                         data=self._user_inputs)
                     except CannotConnectError:
                         _LOGGER.exception("Cannot connect to koolnova system")
@@ -245,6 +365,9 @@ class KoolnovaConfigFlow(ConfigFlow, domain=DOMAIN):
                         errors[CONF_BASE] = "zone_id_error"
                     except Exception as e:
                         _LOGGER.exception("Config Flow generic error")
+                    finally:
+                        # no client left open by the test, whatever its outcome
+                        self._conn.disconnect()
                 else:
                     #_LOGGER.debug("Config_flow [zone] - Une autre zone à configurer")
                     # Update dict
@@ -19,6 +19,9 @@ from .koolnova.const import (
     ZoneClimMode,
     ZoneFanMode,
     ZoneState,
+    POLL_GROUP_TEMP,
+    POLL_GROUP_ZONE,
+    POLL_GROUP_SYSTEM,
 )
 
 DOMAIN = "koolnova_bms"
@@ -34,6 +37,21 @@ DEVICE_MANUFACTURER = "koolnova"
 
 #MIN_TIME_BETWEEN_UPDATES = timedelta(seconds=60)
 
+# Storage of the last known state
+STORAGE_VERSION = 1
+# Delay (seconds) to group the writes of the last known state to storage
+STORAGE_SAVE_DELAY = 30
+
+# Polling interval (seconds) when nothing happens
+DEFAULT_POLL_INTERVAL = 30
+# Polling interval bounds (seconds)
+DEFAULT_POLL_MIN = 5
+DEFAULT_POLL_MAX = 300
+# Fast polling period after a command or a detected change
+FAST_POLL_PERIOD = timedelta(seconds=60)
+# Polling interval growth factor between identical snapshots
+POLL_BACKOFF = 1.5
+
 GLOBAL_MODE_POS_1 = "cold"
 GLOBAL_MODE_POS_2 = "heat"
 GLOBAL_MODE_POS_3 = "heating floor"
@@ -139,3 +157,10 @@ SUPPORTED_FAN_MODES = [
     FAN_MEDIUM,
     FAN_HIGH,
 ]
+
+# registers groups polled at their own period, with the date of their last read
+POLL_GROUP_NAMES = {
+    POLL_GROUP_TEMP: "zone temperatures",
+    POLL_GROUP_ZONE: "zone states",
+    POLL_GROUP_SYSTEM: "engines and system",
+}
@@ -2,11 +2,13 @@
 from __future__ import annotations
 from datetime import timedelta
 import logging
+import time
 
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.util import Throttle
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.storage import Store
 
 from homeassistant.helpers.update_coordinator import (
     CoordinatorEntity,
@@ -16,9 +18,21 @@ from homeassistant.helpers.update_coordinator import (
 
 from .const import (
     DOMAIN,
+    DEFAULT_POLL_INTERVAL,
+    DEFAULT_POLL_MIN,
+    DEFAULT_POLL_MAX,
+    FAST_POLL_PERIOD,
+    POLL_BACKOFF,
+    STORAGE_SAVE_DELAY,
 )
 
 from .koolnova.device import Koolnova
+from .koolnova.operations import register_owner
+from .koolnova.const import (
+    OWNER_ZONE,
+    OWNER_ENGINE,
+    SysState,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -28,14 +42,205 @@ class KoolnovaCoordinator(DataUpdateCoordinator):
     def __init__(self,
                     hass: HomeAssistant, 
                     device: Koolnova,
+                    entry: ConfigEntry,
+                    store: Store | None = None,
+                    poll_min: int = DEFAULT_POLL_MIN,
+                    poll_max: int = DEFAULT_POLL_MAX,
                 ) -> None:
         """ Class constructor """
+        self._poll_min = poll_min
+        self._poll_max = max(poll_min, poll_max)
         super().__init__(
             hass,
             _LOGGER,
-            # Name of the data. For logging purposes.
-            name=DOMAIN,
-            update_method=device.async_update_all_areas,
+            # Name of the data. For logging purposes (one coordinator per controller).
+            name="{} {}".format(DOMAIN, device.name),
             # Polling interval. Will only be polled if there are subscribers.
-            update_interval=timedelta(seconds=30),
-        )
\ No newline at end of file
+            # Adapted after each poll between poll_min and poll_max
+            update_interval=timedelta(seconds=self._clamp(DEFAULT_POLL_INTERVAL)),
+        )
+        self._device = device
+        # background tasks belong to the entry: cancelled on unload
+        self._entry = entry
+        self._store = store
+        self._saved:bool = False
+        self._last_snapshot = device.snapshot
+        self._last_failed = device.failed_registers
+        # (element, id) whose registers changed at the last poll, None to notify every entity
+        self._changes:set | None = None
+        self._notified_success:bool = True
+        # fast polling until this monotonic time
+        self._fast_until:float = 0.0
+        # link supervised in the background: unavailable while down, refreshed when back
+        device.add_link_listener(self._link_changed)
+        # writes journaled while the controller was unreachable survive a restart
+        device.journal.set_listener(self._async_save)
+
+    def _clamp(self, interval:float) -> float:
+        """ bound the polling interval """
+        return min(self._poll_max, max(self._poll_min, interval))
+
+    @callback
+    def _link_changed(self, up:bool) -> None:
+        """ modbus link went down or came back """
+        if up:
+            self._entry.async_create_background_task(self.hass,
+                                                        self.async_request_refresh(),
+                                                        "koolnova refresh on reconnection")
+        elif self.data is not None:
+            # nothing to mark unavailable before a first state is known
+            self.async_set_update_error(UpdateFailed("Modbus link down, reconnecting"))
+
+    async def _async_update_data(self):
+        """ poll the device and adapt the polling interval """
+        if not self._device.connected():
+            # do not wait for the reconnection, done in the background
+            raise UpdateFailed("Modbus link down, reconnecting")
+        stale = self._device.stale
+        data = await self._device.async_update_all_areas()
+        if data is None:
+            # entities unavailable until the controller answers again (circuit breaker state)
+            raise UpdateFailed("Controller {} not answering (circuit {})".format(self._device.name,
+                                                                                self._device.circuit.name.lower()))
+        # snapshots are shared between polls as long as no register changes
+        snapshot = self._device.snapshot
+        failed = self._device.failed_registers
+        changed = self._last_snapshot is not None and snapshot is not self._last_snapshot
+        if self._last_snapshot is None or snapshot is None or stale != self._device.stale:
+            self._changes = None
+        else:
+            # values changed or registers read again/not read (availability)
+            regs = snapshot.diff(self._last_snapshot) | (failed ^ self._last_failed)
+            self._changes = {register_owner(reg) for reg in regs}
+        self._last_snapshot = snapshot
+        self._last_failed = failed
+        _now = time.monotonic()
+        if changed:
+            self._fast_until = _now + FAST_POLL_PERIOD.total_seconds()
+        if self._device.sys_state == SysState.SYS_STATE_OFF:
+            # nothing to follow while the system is off
+            interval = self._poll_max
+        elif _now < self._fast_until:
+            # a change extends the fast polling period
+            interval = self._poll_min
+        else:
+            # nothing moves: poll less and less often
+            interval = self.update_interval.total_seconds() * POLL_BACKOFF
+        self.update_interval = timedelta(seconds=self._clamp(interval))
+        _LOGGER.debug("Next poll in {}".format(self.update_interval))
+        if changed or not self._saved:
+            self._async_save()
+        return data
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """ notify only the entities whose zone, engine or system changed at the last poll,
+            every entity when the coordinator succeeds or fails again or after a command """
+        changes, self._changes = self._changes, None
+        if changes is None or self.last_update_success != self._notified_success:
+            self._notified_success = self.last_update_success
+            super().async_update_listeners()
+            return
+        for update_callback, context in list(self._listeners.values()):
+            if context is None or context in changes:
+                update_callback()
+
+    @property
+    def stale(self) -> bool:
+        """ state restored from the last run, not confirmed by a poll yet """
+        return self._device.stale
+
+    @callback
+    def _async_save(self) -> None:
+        """ save the last known state to storage (grouped writes) """
+        if self._store is not None:
+            self._store.async_delay_save(self._device.stored_data, STORAGE_SAVE_DELAY)
+            self._saved = True
+
+    async def async_close_store(self) -> None:
+        """ write the pending save now and stop saving: no delayed write may recreate
+            the file once the entry is unloaded or removed """
+        store, self._store = self._store, None
+        self._device.journal.set_listener(None)
+        if store is not None and self._saved:
+            await store.async_save(self._device.stored_data)
+
+    async def async_commit(self) -> None:
+        """ publish the device state updated by a command to the entities at once,
+            then read back only the written registers to confirm it """
+        # poll fast for a while to follow the effect of the command
+        self._fast_until = time.monotonic() + FAST_POLL_PERIOD.total_seconds()
+        self.update_interval = timedelta(seconds=self._poll_min)
+        self.async_set_updated_data(self._device.data)
+        written = self._device.pop_written_registers()
+        if written:
+            self._entry.async_create_background_task(self.hass,
+                                                        self._async_verify(written),
+                                                        "koolnova verify written registers")
+
+    async def _async_verify(self, written:dict) -> None:
+        """ align entities on the controller values read back """
+        if not await self._device.async_verify_registers(written):
+            _LOGGER.debug("Written registers not confirmed: {}".format(written))
+        self.async_set_updated_data(self._device.data)
+        self._async_save()
+
+class KoolnovaEntity(CoordinatorEntity):
+    """ entity of one zone, engine or the system of a koolnova controller,
+        notified only when its registers change """
+
+    def __init__(self,
+                    coordinator: KoolnovaCoordinator,
+                    device: Koolnova,
+                    context: tuple,
+                ) -> None:
+        """ Class constructor
+            context: (owner, id) of the registers shown by the entity, None to be notified of every poll """
+        super().__init__(coordinator, context=context)
+        self._device = device
+        # last state written to HA
+        self._written:tuple = None
+
+    def _state(self) -> tuple:
+        """ values shown by the entity, written to HA only when they change """
+        raise NotImplementedError
+
+    def _update_from_data(self, data:dict) -> None:
+        """ take the values of the entity from the coordinator data """
+        raise NotImplementedError
+
+    @property
+    def available(self) -> bool:
+        """ unavailable while the registers of the entity are not read (controller not answering) """
+        if not super().available:
+            return False
+        if self.coordinator_context is None:
+            # entity of the whole controller
+            return True
+        owner, id = self.coordinator_context
+        if owner == OWNER_ZONE:
+            return self._device.area_available(id)
+        if owner == OWNER_ENGINE:
+            return self._device.engine_available(id)
+        return self._device.system_available
+
+    @property
+    def assumed_state(self) -> bool:
+        """ state restored from the last run until the first poll confirms it """
+        return self.coordinator.stale
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """ Handle updated data from the coordinator """
+        # no data before a first poll or restored state: only the availability changes
+        if self.coordinator.data is not None:
+            self._update_from_data(self.coordinator.data)
+        self._async_write_changed_state()
+
+    @callback
+    def _async_write_changed_state(self) -> None:
+        """ write the state only when a value or the availability changed """
+        _state = self._state() + (self.available, self.assumed_state)
+        if _state != self._written:
+            self._written = _state
+            self.async_write_ha_state()
@@ -9,6 +9,24 @@ DEFAULT_TCP_PORT = 502
 DEFAULT_TCP_RETRIES = 3
 DEFAULT_TCP_RECO_DELAY = 0.1
 DEFAULT_TCP_RECO_DELAY_MAX = 300.0
+# Trames RTU (CRC compris) transportees telles quelles sur TCP par la passerelle (EW11)
+# qui les recopie sur sa liaison serie sans conversion Modbus TCP -> RTU
+DEFAULT_RTU_TCP_PORT = 8899
+# Reconnexion en tache de fond quand la liaison est perdue : delai (en secondes) double
+# a chaque tentative, tire au hasard entre la moitie et la totalite de sa valeur
+RECONNECT_DELAY_MIN = 1.0
+RECONNECT_DELAY_MAX = 60.0
+# Ecritures qui n'ont pas pu etre envoyees (liaison coupee, controleur muet) : la derniere
+# valeur de chaque registre est rejouee quand le controleur repond de nouveau,
+# sauf si elle date de plus de JOURNAL_MAX_AGE secondes
+JOURNAL_MAX_AGE = 900
+# Registres a champs de bits (etat/verrou, ventilation/clim) : seuls les bits modifies
+# (masque) sont journalises, fusionnes au rejeu avec la valeur relue du controleur
+REG_MASK_FULL = 0xFFFF
+# Nombre de transactions Modbus TCP en vol sur la passerelle (identifiant de transaction MBAP)
+# 1 = pas de pipeline. Desactive automatiquement si la passerelle perd ou reordonne les reponses
+DEFAULT_PIPELINE_DEPTH = 1
+MAX_PIPELINE_DEPTH = 8
 # La couche physique est Modbus RTU sur RS485 à 9600, avec 8 bits de données, sans parité
 # ou même parité et un bit d'arrêt. Par défaut: 9600 8E1
 # L'adresse Modbus par défaut est 49
@@ -18,12 +36,83 @@ DEFAULT_PARITY = 'E'
 DEFAULT_STOPBITS = 1
 DEFAULT_BYTESIZE = 8
 
+# Delai inter-trame (en secondes) avant chaque transaction Modbus
+# 0 = calcul automatique (3.5 caracteres en RTU et RTU sur TCP, aucun delai en TCP)
+DEFAULT_FRAME_GAP = 0.0
+# Au dela de 19200 bauds, le silence inter-trame est fixe a 1.75 ms
+FRAME_GAP_HIGH_BAUDRATE = 0.00175
+# Delai inter-trame maximum apres des erreurs de communication (timeout, CRC)
+FRAME_GAP_MAX = 1.0
+# Apres une erreur, le delai inter-trame recule d'au moins cette fraction du temps de
+# reponse mesure du controleur (temps qu'il lui faut pour traiter une trame)
+FRAME_GAP_TURNAROUND_RATIO = 0.5
+
+# Priorites des transactions sur le bus (la plus petite valeur passe en premier)
+PRIORITY_WRITE = 0 # commandes utilisateur
+PRIORITY_REFRESH = 1 # relectures ciblees
+PRIORITY_POLL = 2 # scrutation periodique
+
+# Age maximum (en secondes) de la copie locale des registres utilisee pour composer
+# les ecritures des registres partages (etat/enregistrement, mode/ventilation).
+# None = pas de limite, la copie est tenue a jour par chaque lecture et ecriture
+DEFAULT_SHADOW_MAX_AGE = None
+
+# Disjoncteur par controleur : apres CIRCUIT_FAILURE_THRESHOLD transactions sans reponse
+# consecutives, les requetes echouent immediatement pendant CIRCUIT_OPEN_PERIOD secondes
+# puis une lecture d'un seul registre teste le controleur (periode doublee a chaque echec)
+CIRCUIT_FAILURE_THRESHOLD = 3
+CIRCUIT_OPEN_PERIOD = 30
+CIRCUIT_OPEN_PERIOD_MAX = 600
+# Delai d'attente adaptatif de chaque transaction, par point d'acces et code fonction :
+# centile RTT_PERCENTILE des RTT_WINDOW derniers temps de reponse, multiplie par RTT_MARGIN
+# plus RTT_FLOOR secondes. Le delai configure reste le plafond, et s'applique tant
+# que moins de RTT_MIN_SAMPLES temps de reponse ont ete mesures
+RTT_WINDOW = 64
+RTT_MIN_SAMPLES = 8
+RTT_PERCENTILE = 0.95
+RTT_MARGIN = 2.0
+RTT_FLOOR = 0.1
+# Nombre de nouvelles tentatives des seules plages de registres en echec lors d'une lecture
+SPAN_RETRIES = 1
+
+# Groupes de registres scrutes a des periodes differentes (en secondes)
+# - temperatures reelles des zones : a chaque scrutation
+# - etat, mode et consigne des zones, etat du systeme : periode moyenne
+# - machines, efficacite et mode global : periode lente
+POLL_GROUP_TEMP = "temp"
+POLL_GROUP_ZONE = "zone"
+POLL_GROUP_SYSTEM = "system"
+POLL_PERIOD_TEMP = 0
+POLL_PERIOD_ZONE = 60
+POLL_PERIOD_SYSTEM = 600
+
+# Elements auxquels appartiennent les registres : une zone, une machine ou le systeme,
+# identifies par (element, id) pour ne notifier que les entites dont les registres ont change
+OWNER_ZONE = "zone"
+OWNER_ENGINE = "engine"
+OWNER_SYSTEM = "system"
+
+# Fenetre (en secondes) pendant laquelle les lectures demandees sont regroupees
+# en un minimum de requetes Read Holding Registers
+DEFAULT_READ_WINDOW = 0.01
+
+# Fenetre (en secondes) pendant laquelle seule la derniere valeur ecrite dans un registre
+# est conservee (ex: deplacement du curseur de consigne)
+DEFAULT_WRITE_WINDOW = 0.25
+
 # Nombre de machines (AC1, AC2, AC3 et AC4)
 NUM_OF_ENGINES = 4
 # Nombre de registres par zone
 NUM_REG_PER_ZONE = 4
 # Nombre max de zone pour un systeme
 NB_ZONE_MAX = 16
+# Nombre total de registres du systeme (40001 -> 40082)
+NB_REG_TOTAL = 82
+# Nombre max de registres pour un Read Holding Register (limite du PDU Modbus)
+MAX_REG_PER_READ = 125
+# Nombre max de registres inutiles acceptes entre deux registres lus dans une meme requete
+# (2 octets par registre contre une trame complete + delai inter-trame)
+MAX_REG_READ_GAP = 16
 
 # Chaque zone climatique est définie par 4 registres et il y a 16 zones possibles,
 # donc le climat est défini par 64 registres
@@ -153,3 +242,69 @@ class GlobalMode(Enum):
 
     def __int__(self):
         return self.value
+
+# Etat du disjoncteur d'un controleur
+class CircuitState(Enum):
+    CLOSED = 0 # fonctionnement normal
+    OPEN = 1 # le controleur ne repond pas, echec immediat
+    HALF_OPEN = 2 # lecture de test en cours
+
+    def __int__(self):
+        return self.value
+
+# Decodage des registres : chaque champ est decrit par (nom, masque, decalage, type enumere).
+# La table de chaque registre est compilee a l'import : la valeur brute du registre donne
+# directement le tuple des champs decodes, sans passer par le constructeur des Enum.
+# Une valeur inconnue est decodee en None (pas de ValueError pendant une scrutation).
+class RegisterCodec:
+    ''' Table de decodage d'un registre compilee a l'import '''
+
+    __slots__ = ('fields', 'mask', 'strict', 'table', 'unknown')
+
+    def __init__(self, fields:tuple, strict:bool = False) -> None:
+        # strict : les bits hors du masque doivent etre nuls (registre entierement decode)
+        self.fields = tuple(field[0] for field in fields)
+        self.mask = 0
+        for _, mask, _, _ in fields:
+            self.mask |= mask
+        self.strict = strict
+        self.unknown = (None,) * len(fields)
+        _members = [({int(member.value): member for member in kind}, mask, shift) for _, mask, shift, kind in fields]
+        self.table = tuple(tuple(members.get((raw & mask) >> shift) for members, mask, shift in _members)
+                            for raw in range(self.mask + 1))
+
+    def decode(self, raw:int) -> tuple:
+        ''' Champs decodes de la valeur brute, None pour une valeur inconnue '''
+        if self.strict and raw > self.mask:
+            return self.unknown
+        return self.table[raw & self.mask]
+
+ZONE_LOCK_CODEC = RegisterCodec((('state', 0b01, 0, ZoneState),
+                                    ('register', 0b10, 1, ZoneRegister)))
+ZONE_STATE_AND_FLOW_CODEC = RegisterCodec((('fan', 0xF0, 4, ZoneFanMode),
+                                            ('clim', 0x0F, 0, ZoneClimMode)))
+FLOW_ENGINE_CODEC = RegisterCodec((('state', 0xFF, 0, FlowEngine),), strict = True)
+EFFICIENCY_CODEC = RegisterCodec((('eff', 0xFF, 0, Efficiency),), strict = True)
+SYS_STATE_CODEC = RegisterCodec((('sys', 0xFF, 0, SysState),), strict = True)
+GLOBAL_MODE_CODEC = RegisterCodec((('glob', 0xFF, 0, GlobalMode),), strict = True)
+
+# Registre numerique (debit des machines) : la valeur brute est la valeur decodee
+# si elle est dans la plage, None sinon
+class RangeCodec:
+    ''' Table de decodage d'un registre numerique borne compilee a l'import '''
+
+    __slots__ = ('fields', 'mask', 'table', 'unknown')
+
+    def __init__(self, name:str, val_min:int, val_max:int) -> None:
+        self.fields = (name,)
+        self.mask = val_max
+        self.unknown = (None,)
+        self.table = tuple((raw,) if raw >= val_min else self.unknown for raw in range(val_max + 1))
+
+    def decode(self, raw:int) -> tuple:
+        ''' Valeur decodee de la valeur brute, None hors de la plage '''
+        if raw > self.mask:
+            return self.unknown
+        return self.table[raw]
+
+THROUGHPUT_CODEC = RangeCodec('throughput', FLOW_ENGINE_VAL_MIN, FLOW_ENGINE_VAL_MAX)
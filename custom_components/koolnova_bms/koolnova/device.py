@@ -3,12 +3,14 @@
 import re, sys, os
 import logging as log
 import asyncio
+import time
+from datetime import datetime, timezone
 
 from homeassistant.helpers.entity import DeviceInfo
 from ..const import DOMAIN
 
 from . import const
-from .operations import Operations, ModbusConnexionError
+from .operations import Operations, ModbusConnexionError, RegisterSnapshot
 
 _LOGGER = log.getLogger(__name__)
 
@@ -216,6 +218,55 @@ class Engine:
                         self._state,
                         self._order_temp))
 
+class PollGroup:
+    ''' group of registers refreshed with the same period '''
+
+    def __init__(self,
+                    name:str = "",
+                    registers:tuple = (),
+                    period:float = 0,
+                ) -> None:
+        ''' Class constructor '''
+        self._name = name
+        self._registers = tuple(registers)
+        self._period = period
+        self._stamp:float = None
+        self._last_refresh:datetime = None
+
+    @property
+    def name(self) -> str:
+        ''' Get group name '''
+        return self._name
+
+    @property
+    def registers(self) -> tuple:
+        ''' Get group registers '''
+        return self._registers
+
+    @property
+    def last_refresh(self) -> datetime:
+        ''' Get date of the last refresh from the bus, None if never read '''
+        return self._last_refresh
+
+    def due(self, now:float) -> bool:
+        ''' test if the group must be read '''
+        return self._stamp is None or now - self._stamp >= self._period
+
+    def refreshed(self, now:float) -> None:
+        ''' mark the group as read '''
+        self._stamp = now
+        self._last_refresh = datetime.now(timezone.utc)
+
+    def invalidate(self) -> None:
+        ''' force the group to be read at the next poll '''
+        self._stamp = None
+
+    def __repr__(self) -> str:
+        ''' repr method '''
+        return repr('PollGroup(Name:{}, Period:{}, Last refresh:{})'.format(self._name,
+                        self._period,
+                        self._last_refresh))
+
 class Koolnova:
     ''' koolnova Device class '''
 
@@ -232,6 +283,11 @@ class Koolnova:
     _tcp_retries:int = const.DEFAULT_TCP_RETRIES
     _tcp_reco_delay_min:float = const.DEFAULT_TCP_RECO_DELAY
     _tcp_reco_delay_max:float = const.DEFAULT_TCP_RECO_DELAY_MAX
+    _tcp_pipeline_depth:int = const.DEFAULT_PIPELINE_DEPTH
+    _frame_gap:float = const.DEFAULT_FRAME_GAP
+    _shadow_max_age:float = const.DEFAULT_SHADOW_MAX_AGE
+    _read_window:float = const.DEFAULT_READ_WINDOW
+    _write_window:float = const.DEFAULT_WRITE_WINDOW
 
     def __init__(self, mode:str = "", name:str = "", timeout:int = 1, debug:bool = False, **kwargs) -> None:
         ''' Class constructor '''
@@ -240,6 +296,10 @@ class Koolnova:
         self._debug = debug
         self._timeout = timeout
         self.__dict__.update(kwargs)
+        self._frame_gap = kwargs.get('frame_gap', const.DEFAULT_FRAME_GAP)
+        self._shadow_max_age = kwargs.get('shadow_max_age', const.DEFAULT_SHADOW_MAX_AGE)
+        self._read_window = kwargs.get('read_window', const.DEFAULT_READ_WINDOW)
+        self._write_window = kwargs.get('write_window', const.DEFAULT_WRITE_WINDOW)
         if self._mode == "Modbus RTU":
             self._rtu_port = kwargs.get('port', '')
             self._rtu_addr = kwargs.get('addr', const.DEFAULT_ADDR)
@@ -255,7 +315,39 @@ class Koolnova:
                                         baudrate=self._rtu_baudrate,
                                         parity=self._rtu_parity,
                                         bytesize=self._rtu_bytesize,
-                                        stopbits=self._rtu_stopbits)
+                                        stopbits=self._rtu_stopbits,
+                                        frame_gap=self._frame_gap,
+                                        shadow_max_age=self._shadow_max_age,
+                                        read_window=self._read_window,
+                                        write_window=self._write_window)
+        elif self._mode == "Modbus RTU over TCP":
+            self._tcp_port = kwargs.get('port', const.DEFAULT_RTU_TCP_PORT)
+            self._tcp_addr = kwargs.get('addr', const.DEFAULT_TCP_ADDR)
+            self._tcp_modbus = kwargs.get('modbus', const.DEFAULT_ADDR)
+            self._tcp_retries = kwargs.get('retries', const.DEFAULT_TCP_RETRIES)
+            self._tcp_reco_delay_min = kwargs.get('reco_delay_min', const.DEFAULT_TCP_RECO_DELAY)
+            self._tcp_reco_delay_max = kwargs.get('reco_delay_max', const.DEFAULT_TCP_RECO_DELAY_MAX)
+            self._rtu_baudrate = kwargs.get('baudrate', const.DEFAULT_BAUDRATE)
+            self._rtu_parity = kwargs.get('parity', const.DEFAULT_PARITY)
+            self._rtu_bytesize = kwargs.get('bytesize', const.DEFAULT_BYTESIZE)
+            self._rtu_stopbits = kwargs.get('stopbits', const.DEFAULT_STOPBITS)
+            self._client = Operations(mode=self._mode,
+                                        timeout=self._timeout,
+                                        debug=self._debug,
+                                        addr=self._tcp_addr,
+                                        port=self._tcp_port,
+                                        modbus=self._tcp_modbus,
+                                        retries=self._tcp_retries,
+                                        reco_delay_min=self._tcp_reco_delay_min,
+                                        reco_delay_max=self._tcp_reco_delay_max,
+                                        baudrate=self._rtu_baudrate,
+                                        parity=self._rtu_parity,
+                                        bytesize=self._rtu_bytesize,
+                                        stopbits=self._rtu_stopbits,
+                                        frame_gap=self._frame_gap,
+                                        shadow_max_age=self._shadow_max_age,
+                                        read_window=self._read_window,
+                                        write_window=self._write_window)
         elif self._mode == "Modbus TCP":
             self._tcp_port = kwargs.get('port', const.DEFAULT_TCP_PORT)
             self._tcp_addr = kwargs.get('addr', const.DEFAULT_TCP_ADDR)
@@ -263,6 +355,7 @@ class Koolnova:
             self._tcp_retries = kwargs.get('retries', const.DEFAULT_TCP_RETRIES)
             self._tcp_reco_delay_min = kwargs.get('reco_delay_min', const.DEFAULT_TCP_RECO_DELAY)
             self._tcp_reco_delay_max = kwargs.get('reco_delay_max', const.DEFAULT_TCP_RECO_DELAY_MAX)
+            self._tcp_pipeline_depth = kwargs.get('pipeline_depth', const.DEFAULT_PIPELINE_DEPTH)
             self._client = Operations(mode=self._mode,
                                         timeout=self._timeout,
                                         debug=self._debug,
@@ -271,7 +364,12 @@ class Koolnova:
                                         modbus=self._tcp_modbus,
                                         retries=self._tcp_retries,
                                         reco_delay_min=self._tcp_reco_delay_min,
-                                        reco_delay_max=self._tcp_reco_delay_max)
+                                        reco_delay_max=self._tcp_reco_delay_max,
+                                        pipeline_depth=self._tcp_pipeline_depth,
+                                        frame_gap=self._frame_gap,
+                                        shadow_max_age=self._shadow_max_age,
+                                        read_window=self._read_window,
+                                        write_window=self._write_window)
         else:
             raise InitialisationError('unknown mode ({})'.format(self._mode))
         self._global_mode = const.GlobalMode.COLD
@@ -279,59 +377,103 @@ class Koolnova:
         self._sys_state = const.SysState.SYS_STATE_OFF
         self._engines = []
         self._areas = []
+        # areas and engines indexed by id (areas are registered in any order)
+        self._engines_by_id:dict = {}
+        self._areas_by_id:dict = {}
+        # state restored from storage, not confirmed by the bus yet
+        self._stale:bool = False
+        # registers not read at the last poll
+        self._failed:set = set()
+        # last registers snapshot applied to areas, engines and system
+        self._snapshot:RegisterSnapshot = None
+        _zones = [const.REG_START_ZONE + (const.NUM_REG_PER_ZONE * idx) for idx in range(const.NB_ZONE_MAX)]
+        self._groups = {
+            const.POLL_GROUP_TEMP: PollGroup(name = const.POLL_GROUP_TEMP,
+                                                registers = [reg + const.REG_TEMP_REAL for reg in _zones],
+                                                period = const.POLL_PERIOD_TEMP),
+            const.POLL_GROUP_ZONE: PollGroup(name = const.POLL_GROUP_ZONE,
+                                                registers = [reg + off for reg in _zones for off in (const.REG_LOCK_ZONE,
+                                                                                                    const.REG_STATE_AND_FLOW,
+                                                                                                    const.REG_TEMP_ORDER)]
+                                                            + [const.REG_SYS_STATE],
+                                                period = const.POLL_PERIOD_ZONE),
+            const.POLL_GROUP_SYSTEM: PollGroup(name = const.POLL_GROUP_SYSTEM,
+                                                registers = list(range(const.REG_START_FLOW_ENGINE,
+                                                                        const.REG_START_FLOW_STATE_ENGINE + const.NUM_OF_ENGINES))
+                                                            + [const.REG_EFFICIENCY, const.REG_GLOBAL_MODE],
+                                                period = const.POLL_PERIOD_SYSTEM),
+        }
 
     def _area_defined(self, 
                         id_search:int = 0,
-                    ) -> (bool, int):
+                    ) -> (bool, Area):
         """ test if area id is defined """
-        _areas_found = [idx for idx, x in enumerate(self._areas) if x.id_zone == id_search]
-        _idx = 0
-        if not _areas_found:
+        _area = self._areas_by_id.get(id_search)
+        if _area is None:
             _LOGGER.error("Area id ({}) not defined".format(id_search))
-            return False, _idx
-        elif len(_areas_found) > 1:
-            _LOGGER.error("Multiple Area with same id ({})".format(id_search))
-            return False, _idx
-        else:
-            _idx  = _areas_found[0]
-            _LOGGER.debug("idx found: {}".format(_idx))
-        return True, _idx
+            return False, None
+        return True, _area
+
+    def _add_area(self, area:Area) -> None:
+        """ record an area in the list and the index """
+        self._areas.append(area)
+        self._areas_by_id[area.id_zone] = area
+
+    def _create_engines(self) -> None:
+        """ create engines AC1 -> AC4 and their index """
+        self._engines = [Engine(engine_id = idx) for idx in range(1, const.NUM_OF_ENGINES + 1)]
+        self._engines_by_id = {engine.engine_id: engine for engine in self._engines}
 
     async def async_update(self) -> bool:
-        ''' update values from modbus '''
-        _LOGGER.debug("Retreive system status ...")
-        ret, self._sys_state = await self._client.async_system_status()
+        ''' update values from modbus
+            system, engines and areas are built from one read of the registers map '''
+        _LOGGER.debug("Retreive registers map ...")
+        ret, _snap = await self._client.async_snapshot(priority = const.PRIORITY_REFRESH)
         if not ret:
-            _LOGGER.error("Error retreiving system status")
+            _LOGGER.error("Error retreiving registers map")
             self._sys_state = const.SysState.SYS_STATE_OFF
             return False
+        if not self._engines:
+            self._create_engines()
+        self._apply_snapshot(_snap)
+        _now = time.monotonic()
+        for group in self._groups.values():
+            group.refreshed(_now)
+        self._failed = set()
+        self._stale = False
+        return True
 
-        _LOGGER.debug("Retreive global mode ...")
-        ret, self._global_mode = await self._client.async_global_mode()
-        if not ret:
-            _LOGGER.error("Error retreiving global mode")
-            self._global_mode = const.GlobalMode.COLD
+    def restore(self, registers:list) -> bool:
+        ''' build system, engines and areas values from a registers map saved by a previous run '''
+        if not self._client.image.restore(registers):
+            _LOGGER.warning("Saved registers map is not valid")
             return False
-
-        _LOGGER.debug("Retreive efficiency ...")
-        ret, self._efficiency = await self._client.async_efficiency()
-        if not ret:
-            _LOGGER.error("Error retreiving efficiency")
-            self._efficiency = const.Efficiency.LOWER_EFF
+        if not self._engines:
+            self._create_engines()
+        _snap = self._client.image.snapshot()
+        if _snap.invalid():
+            _LOGGER.warning("Saved registers map cannot be decoded: {}".format(_snap.invalid()))
             return False
-        
-        await asyncio.sleep(0.1)
-
-        _LOGGER.debug("Retreive engines ...")
-        for idx in range(1, const.NUM_OF_ENGINES + 1):
-            engine = Engine(engine_id = idx)
-            ret, engine.throughput = await self._client.async_engine_throughput(engine_id = idx)
-            ret, engine.state = await self._client.async_engine_state(engine_id = idx)
-            ret, engine.order_temp = await self._client.async_engine_order_temp(engine_id = idx)
-            self._engines.append(engine)
-            await asyncio.sleep(0.1)
+        self._apply_snapshot(_snap)
+        self._stale = True
         return True
 
+    @property
+    def stale(self) -> bool:
+        ''' values restored from a previous run, not confirmed by the bus yet '''
+        return self._stale
+
+    @property
+    def journal(self):
+        ''' writes waiting for the controller to answer again '''
+        return self._client.journal
+
+    def stored_data(self) -> dict:
+        ''' last known registers map and journaled writes, as saved to storage
+            (system, engines and areas values are decoded again from the map by restore) '''
+        return {"registers": self._client.image.values,
+                "journal": self._client.journal.dump()}
+
     async def async_connect(self) -> bool:
         ''' connect to the modbus serial server '''
         ret = True
@@ -347,19 +489,23 @@ class Koolnova:
 
     def connected(self) -> bool:
         ''' get modbus client status '''
-        return self._client.connected
+        return self._client.connected()
 
     def disconnect(self) -> None:
         ''' close the underlying socket connection '''
         self._client.disconnect()
 
+    def add_link_listener(self, callback) -> None:
+        ''' call callback(up:bool) when the modbus link goes down or comes back '''
+        self._client.add_link_listener(callback)
+
     async def async_discover_areas(self) -> None:
         ''' Set all registered areas for system '''
         if not self._client.connected:
             raise ModbusConnexionError('Client Modbus not connected')
         zones_lst = await self._client.async_discover_registered_areas()
         for zone in zones_lst:
-            self._areas.append(Area(name = zone['name'],
+            self._add_area(Area(name = zone['name'],
                                     id_zone = zone['id'],
                                     state = zone['state'],
                                     register = zone['register'],
@@ -377,24 +523,35 @@ class Koolnova:
         if not self._client.connected:
             raise ModbusConnexionError('Client Modbus not connected')
 
-        ret, zone_dict = await self._client.async_area_registered(zone_id = id_zone)
+        _snap = self._client.image.snapshot()
+        if _snap is not None:
+            # registers map already read, no need to question the bus
+            _view = _snap.area(id_zone)
+            ret, zone_dict = _view.registered, {}
+        else:
+            ret, zone_dict = await self._client.async_area_registered(zone_id = id_zone)
         if not ret:
             _LOGGER.error("Zone with ID: {} is not registered".format(id_zone))
             return False
-        for zone in self._areas:
-            if id_zone == zone.id_zone:
-                _LOGGER.error('Zone registered with ID: {} is already saved')
-                return False
+        if id_zone in self._areas_by_id:
+            _LOGGER.error('Zone registered with ID: {} is already saved'.format(id_zone))
+            return False
         
-        self._areas.append(Area(name = name,
-                                id_zone = id_zone,
-                                state = zone_dict['state'],
-                                register = zone_dict['register'],
-                                fan_mode = zone_dict['fan'],
-                                clim_mode = zone_dict['clim'],
-                                real_temp = zone_dict['real_temp'],
-                                order_temp = zone_dict['order_temp']
-                                ))
+        if not zone_dict:
+            # values taken from the registers map snapshot
+            _area = Area(name = name, id_zone = id_zone)
+            self._apply_area(_area, _view)
+            self._add_area(_area)
+        else:
+            self._add_area(Area(name = name,
+                                    id_zone = id_zone,
+                                    state = zone_dict['state'],
+                                    register = zone_dict['register'],
+                                    fan_mode = zone_dict['fan'],
+                                    clim_mode = zone_dict['clim'],
+                                    real_temp = zone_dict['real_temp'],
+                                    order_temp = zone_dict['order_temp']
+                                    ))
         _LOGGER.debug("Areas registered: {}".format(self._areas))
         return True
 
@@ -404,8 +561,8 @@ class Koolnova:
         return self._areas
 
     def get_area(self, zone_id:int = 0) -> Area:
-        ''' get specific area '''
-        return self._areas[zone_id - 1]
+        ''' get specific area from its id, None if not registered '''
+        return self._areas_by_id.get(zone_id)
 
     async def async_update_area(self, zone_id:int = 0) -> bool:
         """ update specific area from zone_id """
@@ -413,66 +570,188 @@ class Koolnova:
         if not ret:
             _LOGGER.error("Error retreiving area ({}) values".format(zone_id))
             return ret, None
-        for idx, area in enumerate(self._areas):
-                if area.id_zone == zone_id:
-                    # update areas list values from modbus response
-                    self._areas[idx].state = infos['state']
-                    self._areas[idx].register = infos['register']
-                    self._areas[idx].fan_mode = infos['fan']
-                    self._areas[idx].clim_mode = infos['clim']
-                    self._areas[idx].real_temp = infos['real_temp']
-                    self._areas[idx].order_temp = infos['order_temp']
-                    break
-        return ret, self._areas[zone_id - 1]
+        _area = self._areas_by_id.get(zone_id)
+        if _area is not None:
+            # update area values from modbus response
+            _area.state = infos['state']
+            _area.register = infos['register']
+            _area.fan_mode = infos['fan']
+            _area.clim_mode = infos['clim']
+            _area.real_temp = infos['real_temp']
+            _area.order_temp = infos['order_temp']
+        return ret, _area
 
     async def async_update_all_areas(self) -> list:
-        """ update all areas registered and all engines values """
-        ##### Areas
-        _ret, _vals = await self._client.async_areas_registered()
-        if not _ret:
+        """ update all areas registered and all engines values
+            only the registers groups whose period elapsed are read """
+        _now = time.monotonic()
+        _off = self._client.image.get(const.REG_SYS_STATE) == int(const.SysState.SYS_STATE_OFF)
+        if _off:
+            # system switched off: only follow its state and the real temperatures
+            _due = [self._groups[const.POLL_GROUP_TEMP]]
+            _regs = {const.REG_SYS_STATE}
+        else:
+            _due = [group for group in self._groups.values() if group.due(_now)]
+            _regs = set()
+        for group in _due:
+            _regs.update(group.registers)
+        _ret, _vals = await self._client.async_read_registers_map(_regs, priority = const.PRIORITY_POLL)
+        if not _vals:
             _LOGGER.error("Error retreiving areas values")
             return None
-        else:
-            for k,v in _vals.items():
-                for _idx, _area in enumerate(self._areas):
-                    if k == _area.id_zone:
-                        # update areas list values from modbus response
-                        self._areas[_idx].state = v['state']
-                        self._areas[_idx].register = v['register']
-                        self._areas[_idx].fan_mode = v['fan']
-                        self._areas[_idx].clim_mode = v['clim']
-                        self._areas[_idx].real_temp = v['real_temp']
-                        self._areas[_idx].order_temp = v['order_temp']
+        # registers not read keep their last value, the entities using them are unavailable
+        self._failed = _regs.difference(_vals)
+        _due = [group for group in _due if self._failed.isdisjoint(group.registers)]
+        for group in _due:
+            group.refreshed(_now)
+        _LOGGER.debug("Groups refreshed: {}".format([group.name for group in _due]))
+        if _off and self._client.image.get(const.REG_SYS_STATE) != int(const.SysState.SYS_STATE_OFF):
+            _LOGGER.debug("System switched on, back to full polling")
+            self.invalidate()
+            return await self.async_update_all_areas()
+        _snap = self._client.image.snapshot()
+        if _snap is None:
+            # registers map not fully known yet, read everything at once
+            _ret, _snap = await self._client.async_snapshot()
+            if not _ret:
+                _LOGGER.error("Error retreiving areas values")
+                return None
+            self._failed = set()
+        self._apply_snapshot(_snap)
+        self._stale = False
+        return self.data
+
+    def _registers_available(self, regs) -> bool:
+        """ test if registers were read at the last poll and the controller answers """
+        return self._client.circuit != const.CircuitState.OPEN and self._failed.isdisjoint(regs)
+
+    def area_available(self, id_zone:int) -> bool:
+        """ test if the area registers were read at the last poll """
+        _start = const.REG_START_ZONE + const.NUM_REG_PER_ZONE * (id_zone - 1)
+        return self._registers_available(range(_start, _start + const.NUM_REG_PER_ZONE))
+
+    def engine_available(self, engine_id:int) -> bool:
+        """ test if the engine registers were read at the last poll """
+        return self._registers_available([const.REG_START_FLOW_ENGINE + engine_id - 1,
+                                            const.REG_START_ORDER_TEMP + engine_id - 1,
+                                            const.REG_START_FLOW_STATE_ENGINE + engine_id - 1])
 
-        ##### Engines
-        for _idx in range(1, const.NUM_OF_ENGINES + 1):
-            ret, self._engines[_idx - 1].throughput = await self._client.async_engine_throughput(engine_id = _idx)
-            ret, self._engines[_idx - 1].state = await self._client.async_engine_state(engine_id = _idx)
-            ret, self._engines[_idx - 1].order_temp = await self._client.async_engine_order_temp(engine_id = _idx)
+    @property
+    def system_available(self) -> bool:
+        """ test if the system registers were read at the last poll """
+        return self._registers_available([const.REG_SYS_STATE, const.REG_GLOBAL_MODE, const.REG_EFFICIENCY])
 
-        ##### Global mode
-        ret, self._global_mode = await self._client.async_global_mode()
-        if not ret:
-            _LOGGER.error("Error retreiving global mode")
-            self._global_mode = const.GlobalMode.COLD
+    @property
+    def circuit(self) -> const.CircuitState:
+        """ circuit breaker state of the controller """
+        return self._client.circuit
 
-        ##### Efficiency
-        ret, self._efficiency = await self._client.async_efficiency()
-        if not ret:
-            _LOGGER.error("Error retreiving efficiency")
-            self._efficiency = const.Efficiency.LOWER_EFF
+    def invalidate(self, group:str = None) -> None:
+        """ force a registers group (all groups if None) to be read at the next poll """
+        for name, _group in self._groups.items():
+            if group is None or name == group:
+                _group.invalidate()
+
+    @property
+    def freshness(self) -> dict:
+        """ date of the last refresh of each registers group """
+        return {name: group.last_refresh for name, group in self._groups.items()}
+
+    def _apply_snapshot(self, snap:RegisterSnapshot) -> None:
+        """ update areas, engines and system from a registers snapshot,
+            views shared with the last applied snapshot did not change and are skipped """
+        _last = self._snapshot
+        if snap is _last:
+            # nothing changed since the last poll
+            return
+        _invalid = snap.invalid()
+        if _invalid:
+            # undecodable values keep the last known ones
+            _LOGGER.warning("Unknown values in registers: {}".format({reg: snap[reg] for reg in _invalid}))
+        ##### Areas
+        for _area in self._areas:
+            _view = snap.area(_area.id_zone)
+            if _last is not None and _view is _last.area(_area.id_zone):
+                continue
+            # update areas list values from modbus response
+            self._apply_area(_area, _view)
 
-        ##### Sys state
-        ret, self._sys_state = await self._client.async_system_status()
+        ##### Engines
+        for _engine in self._engines:
+            _view = snap.engine(_engine.engine_id)
+            if _last is not None and _view is _last.engine(_engine.engine_id):
+                continue
+            if _view.throughput is not None:
+                _engine.throughput = _view.throughput
+            if _view.state is not None:
+                _engine.state = _view.state
+            _engine.order_temp = _view.order_temp
+
+        ##### Global mode, Efficiency, Sys state
+        self._global_mode = snap.global_mode or self._global_mode
+        self._efficiency = snap.efficiency or self._efficiency
+        self._sys_state = snap.sys_state or self._sys_state
+        self._snapshot = snap
+
+    @staticmethod
+    def _apply_area(area:Area, view) -> None:
+        """ copy the area values of a snapshot view, unknown values are left unchanged """
+        for field in ('state', 'register', 'fan_mode', 'clim_mode', 'real_temp', 'order_temp'):
+            _val = getattr(view, field)
+            if _val is not None:
+                setattr(area, field, _val)
+
+    def _model_changed(self) -> None:
+        """ model changed by a command: the next snapshot is applied as a whole,
+            the registers left unchanged by the controller (write rejected) roll it back """
+        self._snapshot = None
+
+    def pop_written_registers(self) -> dict:
+        """ registers written since the last read back ({reg: val}) """
+        return self._client.pop_written_registers()
+
+    async def async_verify_registers(self,
+                                        written:dict,
+                                        ) -> bool:
+        """ read back written registers and align the model on the controller values """
+        ret, vals = await self._client.async_read_registers_map(written.keys())
         if not ret:
-            _LOGGER.error("Error retreiving system status")
-            self._sys_state = const.SysState.SYS_STATE_OFF
+            _LOGGER.error("Error reading back registers: {}".format(list(written.keys())))
+            return False
+        _match = True
+        for reg, val in written.items():
+            if vals.get(reg) != val:
+                _LOGGER.warning("Register {} read back {} instead of {} (rejected or clamped by the controller)".format(
+                                    reg, vals.get(reg), val))
+                _match = False
+        _snap = self._client.image.snapshot()
+        if _snap is None:
+            # registers map never fully read, refresh everything
+            return await self.async_update_all_areas() is not None and _match
+        self._apply_snapshot(_snap)
+        return _match
 
+    @property
+    def failed_registers(self) -> frozenset:
+        """ registers not read at the last poll """
+        return frozenset(self._failed)
+
+    @property
+    def snapshot(self) -> RegisterSnapshot:
+        """ last registers snapshot applied, the same object as long as nothing changes """
+        return self._snapshot
+
+    @property
+    def data(self) -> dict:
+        """ areas, engines and system values as published to the coordinator """
         return {"areas": self._areas, 
                 "engines": self._engines,
+                "areas_by_id": self._areas_by_id,
+                "engines_by_id": self._engines_by_id,
                 "glob": self._global_mode,
                 "eff": self._efficiency,
-                "sys": self._sys_state}
+                "sys": self._sys_state,
+                "freshness": self.freshness}
 
     @property
     def engines(self) -> list:
@@ -505,7 +784,8 @@ class Koolnova:
         if not ret:
             _LOGGER.error("[GLOBAL] Error writing {} to modbus".format(val))
             raise UpdateValueError('Error writing to modbus updated value')
-        self._engines[engine_id - 1].state = val
+        self._engines_by_id[engine_id].state = val
+        self._model_changed()
 
     @property
     def global_mode(self) -> const.GlobalMode:
@@ -524,6 +804,7 @@ class Koolnova:
             _LOGGER.error("[GLOBAL] Error writing {} to modbus".format(val))
             raise UpdateValueError('Error writing to modbus updated value')
         self._global_mode = val
+        self._model_changed()
 
     @property
     def efficiency(self) -> const.Efficiency:
@@ -542,6 +823,7 @@ class Koolnova:
             _LOGGER.error("[EFF] Error writing {} to modbus".format(val))
             raise UpdateValueError('Error writing to modbus updated value')    
         self._efficiency = val
+        self._model_changed()
 
     @property
     def debug(self) -> bool:
@@ -577,13 +859,17 @@ class Koolnova:
         if not ret:
             _LOGGER.error("[SYS_STATE] Error writing {} to modbus".format(val))
             raise UpdateValueError('Error writing to modbus updated value') 
+        if val == const.SysState.SYS_STATE_ON and self._sys_state != val:
+            # values not followed while the system was off
+            self.invalidate()
         self._sys_state = val
+        self._model_changed()
 
     async def async_get_area_temp(self,
                                     zone_id:int,
                                 ) -> float:
         """ get current temp of specific Area """
-        _ret, _idx = self._area_defined(id_search = zone_id)
+        _ret, _area = self._area_defined(id_search = zone_id)
         if not _ret:
             _LOGGER.error("Area not defined ...")
             return False
@@ -592,7 +878,7 @@ class Koolnova:
         if not ret:
             _LOGGER.error("Error reading temp for area with ID: {}".format(zone_id))
             return False
-        self._areas[_idx].real_temp = temp
+        _area.real_temp = temp
         return temp
 
     async def async_set_area_target_temp(self,
@@ -600,7 +886,7 @@ class Koolnova:
                                         temp:float,
                                         ) -> bool:
         """ set target temp of specific area """
-        _ret, _idx = self._area_defined(id_search = zone_id)
+        _ret, _area = self._area_defined(id_search = zone_id)
         if not _ret:
             _LOGGER.error("Area not defined ...")
             return False
@@ -609,14 +895,15 @@ class Koolnova:
         if not ret:
             _LOGGER.error("Error writing target temp for area with ID: {}".format(zone_id))
             return False
-        self._areas[_idx].order_temp = temp
+        _area.order_temp = temp
+        self._model_changed()
         return True
 
     async def async_get_area_target_temp(self,
                                         zone_id:int,
                                         ) -> float:
         """ get target temp of specific area """
-        _ret, _idx = self._area_defined(id_search = zone_id)
+        _ret, _area = self._area_defined(id_search = zone_id)
         if not _ret:
             _LOGGER.error("Area not defined ...")
             return False
@@ -625,14 +912,14 @@ class Koolnova:
         if not ret:
             _LOGGER.error("Error reading target temp for area with ID: {}".format(zone_id))
             return 0.0
-        self._areas[_idx].order_temp = temp
+        _area.order_temp = temp
         return temp
 
     async def async_set_area_off(self,
                                 zone_id:int,
                                 ) -> bool:
         """ set area off """
-        _ret, _idx = self._area_defined(id_search = zone_id)
+        _ret, _area = self._area_defined(id_search = zone_id)
         if not _ret:
             _LOGGER.error("Area not defined ...")
             return False
@@ -641,14 +928,15 @@ class Koolnova:
         if not ret:
             _LOGGER.error("Error writing area state (STATE_OFF) for area with ID: {}".format(zone_id))
             return False
-        self._areas[_idx].state = const.ZoneState.STATE_OFF
+        _area.state = const.ZoneState.STATE_OFF
+        self._model_changed()
         return True
     
     async def async_set_area_on(self,
                                 zone_id:int,
                                 ) -> bool:
         """ set area on """
-        _ret, _idx = self._area_defined(id_search = zone_id)
+        _ret, _area = self._area_defined(id_search = zone_id)
         if not _ret:
             _LOGGER.error("Area not defined ...")
             return False
@@ -657,7 +945,8 @@ class Koolnova:
         if not ret:
             _LOGGER.error("Error writing area state (STATE_ON) for area with ID: {}".format(zone_id))
             return False
-        self._areas[_idx].state = const.ZoneState.STATE_ON
+        _area.state = const.ZoneState.STATE_ON
+        self._model_changed()
         return True
 
     async def async_set_area_clim_mode(self,
@@ -665,7 +954,7 @@ class Koolnova:
                                         mode:const.ZoneClimMode,
                                         ) -> bool:
         """ set climate mode for specific area """
-        _ret, _idx = self._area_defined(id_search = zone_id)
+        _ret, _area = self._area_defined(id_search = zone_id)
         if not _ret:
             _LOGGER.error("Area not defined ...")
             return False
@@ -676,9 +965,10 @@ class Koolnova:
             if not ret:
                 _LOGGER.error("Error writing area state for area with ID: {}".format(zone_id))
                 return False
-            self._areas[_idx].state = const.ZoneState.STATE_OFF
+            _area.state = const.ZoneState.STATE_OFF
+            self._model_changed()
         else:
-            if self._areas[_idx].state == const.ZoneState.STATE_OFF:
+            if _area.state == const.ZoneState.STATE_OFF:
                 _LOGGER.debug("Set area state to ON")
                 # update area state
                 ret = await self._client.async_set_area_state(id_zone = zone_id, val = const.ZoneState.STATE_ON)
@@ -691,7 +981,8 @@ class Koolnova:
             if not ret:
                 _LOGGER.error("Error writing climate mode for area with ID: {}".format(zone_id))
                 return False
-            self._areas[_idx].clim_mode = mode
+            _area.clim_mode = mode
+            self._model_changed()
         return True
 
     async def async_set_area_fan_mode(self,
@@ -700,12 +991,12 @@ class Koolnova:
                                         ) -> bool:
         """ set fan mode for specific area """
         # test if area id is defined
-        _ret, _idx = self._area_defined(id_search = zone_id)
+        _ret, _area = self._area_defined(id_search = zone_id)
         if not _ret:
             _LOGGER.error("Area not defined ...")
             return False
 
-        if self._areas[_idx].state == const.ZoneState.STATE_OFF:
+        if _area.state == const.ZoneState.STATE_OFF:
             _LOGGER.warning("Area state is off, cannot change fan speed ...")
             return False
         else:
@@ -716,7 +1007,8 @@ class Koolnova:
                 _LOGGER.error("Error writing fan mode for area with ID: {}".format(zone_id))
                 return False
             # update fan mode in list for specific area
-            self._areas[_idx].fan_mode = mode
+            _area.fan_mode = mode
+            self._model_changed()
         return True
 
     def __repr__(self) -> str:
@@ -2,10 +2,19 @@
 
 import re, sys, os
 import logging as log
+import time
+import weakref
+import heapq
+import itertools
+import random
+import struct
+from array import array
+from collections import deque
 
 import asyncio
+from contextlib import asynccontextmanager, contextmanager
 
-from pymodbus import pymodbus_apply_logging_config
+from pymodbus import pymodbus_apply_logging_config, FramerType
 from pymodbus.client import AsyncModbusSerialClient as ModbusClient
 from pymodbus.client import AsyncModbusTcpClient as ModbusTcpClient
 from pymodbus.exceptions import ModbusException
@@ -16,6 +25,1213 @@ from . import const
 
 _LOGGER = log.getLogger(__name__)
 
+def plan_read_spans(regs,
+                    max_gap:int = const.MAX_REG_READ_GAP,
+                    max_count:int = const.MAX_REG_PER_READ,
+                    ) -> list:
+    ''' Merge registers into the fewest contiguous (start, count) read spans '''
+    spans = []
+    for reg in sorted(set(regs)):
+        if spans:
+            start, count = spans[-1]
+            if reg - (start + count) <= max_gap and reg - start < max_count:
+                spans[-1] = (start, reg - start + 1)
+                continue
+        spans.append((reg, 1))
+    return spans
+
+def decode_area(lock:int, state_and_flow:int, order_temp:int, real_temp:int) -> dict:
+    ''' Decode an area from its 4 registers, None if not registered or holding an unknown value '''
+    _state, _register = const.ZONE_LOCK_CODEC.decode(lock)
+    if _register != const.ZoneRegister.REGISTER_ON:
+        return None
+    _fan, _clim = const.ZONE_STATE_AND_FLOW_CODEC.decode(state_and_flow)
+    if _state is None or _fan is None or _clim is None:
+        _LOGGER.warning("Unknown area values: {:#x} - {:#x}".format(lock, state_and_flow))
+        return None
+    return {'state': _state,
+            'register': _register,
+            'fan': _fan,
+            'clim': _clim,
+            'order_temp': order_temp / 2,
+            'real_temp': real_temp / 2}
+
+def register_owner(reg:int) -> tuple:
+    ''' Get the element a register belongs to: (OWNER_ZONE, id), (OWNER_ENGINE, id), (OWNER_SYSTEM, 0) or None '''
+    if const.REG_START_ZONE <= reg < const.REG_START_ZONE + const.NB_ZONE_MAX * const.NUM_REG_PER_ZONE:
+        return (const.OWNER_ZONE, (reg - const.REG_START_ZONE) // const.NUM_REG_PER_ZONE + 1)
+    if const.REG_START_FLOW_ENGINE <= reg < const.REG_START_FLOW_STATE_ENGINE + const.NUM_OF_ENGINES:
+        return (const.OWNER_ENGINE, (reg - const.REG_START_FLOW_ENGINE) % const.NUM_OF_ENGINES + 1)
+    if reg in (const.REG_EFFICIENCY, const.REG_SYS_STATE, const.REG_GLOBAL_MODE):
+        return (const.OWNER_SYSTEM, 0)
+    return None
+
+def decode_areas(regs:list) -> dict:
+    ''' Decode registered areas from the zones registers block (40001 -> 40064) '''
+    _areas_dict:dict = {}
+    for area_idx in range(const.NB_ZONE_MAX):
+        _idx:int = const.NUM_REG_PER_ZONE * area_idx
+        _area_dict = decode_area(*regs[_idx:_idx + const.NUM_REG_PER_ZONE])
+        if _area_dict is not None:
+            _areas_dict[area_idx + 1] = _area_dict
+    return _areas_dict
+
+class FramePacer:
+    ''' Inter-frame gap scheduler for one Modbus link: the RTU silent interval while
+        the link is healthy, backed off after errors by a step sized on the measured turnaround '''
+
+    def __init__(self,
+                    mode:str,
+                    gap:float = const.DEFAULT_FRAME_GAP,
+                    baudrate:int = const.DEFAULT_BAUDRATE,
+                    bytesize:int = const.DEFAULT_BYTESIZE,
+                    parity:str = const.DEFAULT_PARITY,
+                    stopbits:int = const.DEFAULT_STOPBITS,
+                ) -> None:
+        ''' Class constructor '''
+        if gap:
+            # gap forced by configuration
+            self._base_gap = gap
+        elif mode in ('Modbus RTU', 'Modbus RTU over TCP'):
+            # RTU over TCP: the gateway copies the frames on its serial line, the silence
+            # between two frames is the one of the serial side
+            self._base_gap = FramePacer.silent_interval(baudrate, bytesize, parity, stopbits)
+        else:
+            self._base_gap = 0.0
+        self._backoff:float = 0.0
+        self._last_frame:float = 0.0
+        # smoothed time from the request to the end of the reply, None until measured
+        self._turnaround:float = None
+        # RTU frames carry no transaction id: a late reply would be taken for the next one
+        self._rtu:bool = mode in ('Modbus RTU', 'Modbus RTU over TCP')
+        self._hold_until:float = 0.0
+
+    @staticmethod
+    def silent_interval(baudrate:int, bytesize:int, parity:str, stopbits:int) -> float:
+        ''' RTU silent interval of 3.5 characters for the serial line settings '''
+        if baudrate > 19200:
+            return const.FRAME_GAP_HIGH_BAUDRATE
+        # start bit + data bits + parity bit + stop bits
+        char_bits = 1 + bytesize + (0 if parity == 'N' else 1) + stopbits
+        return 3.5 * char_bits / baudrate
+
+    @property
+    def gap(self) -> float:
+        ''' Get current inter-frame gap '''
+        return min(self._base_gap + self._backoff, const.FRAME_GAP_MAX)
+
+    @property
+    def turnaround(self) -> float:
+        ''' Get smoothed turnaround of the link, None until measured '''
+        return self._turnaround
+
+    def hold(self, delay:float) -> None:
+        ''' No answer before the deadline: keep the RTU line quiet for delay seconds,
+            a late reply is then dropped by the client instead of answering the next request '''
+        if self._rtu:
+            self._hold_until = max(self._hold_until, time.monotonic() + delay)
+
+    @asynccontextmanager
+    async def async_frame(self):
+        ''' Wait the inter-frame gap before a transaction and measure its turnaround '''
+        _delay = max(self._last_frame + self.gap, self._hold_until) - time.monotonic()
+        if _delay > 0:
+            await asyncio.sleep(_delay)
+        _start = time.monotonic()
+        try:
+            yield
+        except Exception:
+            # no answer or corrupted frame: back off before the next transaction,
+            # at least the share of a turnaround the controller needs to process a frame
+            self._last_frame = time.monotonic()
+            _step = max(self._base_gap,
+                        const.FRAME_GAP_HIGH_BAUDRATE,
+                        (self._turnaround or 0.0) * const.FRAME_GAP_TURNAROUND_RATIO)
+            self._backoff = min(max(2 * self._backoff, _step), const.FRAME_GAP_MAX)
+            _LOGGER.debug("transaction error, inter-frame gap: {:.4f}s".format(self.gap))
+            raise
+        self._last_frame = time.monotonic()
+        _elapsed = self._last_frame - _start
+        if self._turnaround is None:
+            self._turnaround = _elapsed
+        else:
+            self._turnaround = 0.8 * self._turnaround + 0.2 * _elapsed
+        # decay the back off after each successful exchange
+        self._backoff = self._backoff / 2 if self._backoff > const.FRAME_GAP_HIGH_BAUDRATE else 0.0
+
+class PriorityLock:
+    ''' Bus lock granted by transaction priority, then by rank, then in arrival order.
+        Held by up to capacity() transactions at once (1 unless the link pipelines requests) '''
+
+    def __init__(self, capacity = None) -> None:
+        ''' Class constructor '''
+        self._capacity = capacity if capacity is not None else (lambda: 1)
+        self._holders:int = 0
+        # heap of waiters: [priority, rank, sequence, future]
+        self._waiters:list = []
+        self._seq = itertools.count()
+
+    def locked(self) -> bool:
+        ''' lock status '''
+        return self._holders >= self._capacity()
+
+    async def acquire(self, priority:int = const.PRIORITY_POLL, rank:int = 0) -> bool:
+        ''' wait for the lock '''
+        if not self.locked() and not self._waiters:
+            self._holders += 1
+            return True
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [priority, rank, next(self._seq), fut])
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # lock handed over while cancelled: pass it to the next waiter
+                self.release()
+            raise
+        return True
+
+    def release(self) -> None:
+        ''' hand the lock over to the most urgent waiters '''
+        self._holders -= 1
+        while self._waiters and not self.locked():
+            fut = heapq.heappop(self._waiters)[-1]
+            if not fut.done():
+                self._holders += 1
+                fut.set_result(True)
+
+    @asynccontextmanager
+    async def async_hold(self, priority:int = const.PRIORITY_POLL, rank:int = 0):
+        ''' hold the lock for one transaction '''
+        await self.acquire(priority, rank)
+        try:
+            yield
+        finally:
+            self.release()
+
+class RttEstimator:
+    ''' Rolling response times of one link, per function code and request size,
+        giving the deadline of the next transaction '''
+
+    def __init__(self,
+                    window:int = const.RTT_WINDOW,
+                    min_samples:int = const.RTT_MIN_SAMPLES,
+                    percentile:float = const.RTT_PERCENTILE,
+                    margin:float = const.RTT_MARGIN,
+                    floor:float = const.RTT_FLOOR,
+                ) -> None:
+        ''' Class constructor '''
+        self._window = window
+        self._min_samples = min_samples
+        self._percentile = percentile
+        self._margin = margin
+        self._floor = floor
+        # {(function code, size class): deque of response times}
+        self._samples:dict = {}
+
+    @staticmethod
+    def _key(function_code:int, count:int) -> tuple:
+        ''' a read of 82 registers lasts longer than a read of one on a slow serial line '''
+        return (function_code, count.bit_length())
+
+    def record(self, function_code:int, count:int, rtt:float) -> None:
+        ''' Add a response time (or the deadline of a timed out transaction) '''
+        _key = RttEstimator._key(function_code, count)
+        if _key not in self._samples:
+            self._samples[_key] = deque(maxlen=self._window)
+        self._samples[_key].append(rtt)
+
+    def missed(self, function_code:int, count:int) -> None:
+        ''' No answer before the deadline: the link slowed down, the response times known
+            are forgotten and the ceiling applies until enough new ones are measured '''
+        self._samples.pop(RttEstimator._key(function_code, count), None)
+
+    def deadline(self, function_code:int, count:int, ceiling:float) -> float:
+        ''' Get the deadline of a transaction, ceiling until enough response times are known '''
+        _samples = self._samples.get(RttEstimator._key(function_code, count))
+        if _samples is None or len(_samples) < self._min_samples:
+            return ceiling
+        _sorted = sorted(_samples)
+        _rtt = _sorted[int(self._percentile * (len(_sorted) - 1))]
+        return min(ceiling, _rtt * self._margin + self._floor)
+
+class ModbusBus:
+    ''' Physical Modbus bus (RS485 line or TCP gateway) shared by all its clients:
+        one connection, multiplexed between the sessions of each slave ID '''
+
+    # buses in use, released with their last client
+    _buses = weakref.WeakValueDictionary()
+
+    def __init__(self, key:str, pacer:FramePacer, client) -> None:
+        ''' Class constructor '''
+        self._key = key
+        self._pacer = pacer
+        self._client = client
+        self._rtt = RttEstimator()
+        # transactions in flight at once: the pipelining depth of the client, 1 otherwise
+        self._lock = PriorityLock(lambda: getattr(self._client, 'depth', 1))
+        # sessions attached to the connection: {session: rank of its next transaction}
+        self._sessions:dict = {}
+        self._session_ids = itertools.count()
+        # rank of the last transaction granted (fair scheduling virtual clock)
+        self._clock:int = 0
+        # link state listeners: {session: [callback(up:bool)]}
+        self._listeners:dict = {}
+        self._link_up:bool = None
+        self._reconnect_task = None
+
+    @classmethod
+    def get(cls, key:str, pacer:FramePacer, client_factory) -> 'ModbusBus':
+        ''' Get the bus identified by key, created on first use with the pacer and
+            the pymodbus client built by client_factory (settings of the first session win) '''
+        bus = cls._buses.get(key)
+        if bus is None:
+            bus = cls(key, pacer, client_factory())
+            cls._buses[key] = bus
+        return bus
+
+    @staticmethod
+    def serial_key(port:str) -> str:
+        ''' Bus key of a serial line (symlinks resolved to the real tty) '''
+        return "rtu:{}".format(os.path.realpath(port) if port else port)
+
+    @staticmethod
+    def tcp_key(host:str, port:int, framing:str = "tcp") -> str:
+        ''' Bus key of a TCP gateway (framing: tcp for MBAP, rtutcp for raw RTU frames) '''
+        return "{}:{}:{}".format(framing, host, port)
+
+    @property
+    def key(self) -> str:
+        ''' Get bus key '''
+        return self._key
+
+    @property
+    def client(self):
+        ''' Get the pymodbus client shared by the sessions '''
+        return self._client
+
+    @property
+    def sessions(self) -> int:
+        ''' Get number of sessions attached to the connection '''
+        return len(self._sessions)
+
+    def connected(self) -> bool:
+        ''' get shared connection status '''
+        return self._client.connected
+
+    def open_session(self) -> int:
+        ''' Get a new session identifier, not attached to the connection yet '''
+        return next(self._session_ids)
+
+    async def async_attach(self, session:int) -> None:
+        ''' Attach a session to the connection, opened by the first one.
+            Reconnected in the background if it cannot be opened '''
+        if session not in self._sessions:
+            # a new session starts at the current virtual clock, not ahead of the others
+            self._sessions[session] = self._clock
+        if self._reconnect_task is not None:
+            return
+        async with self._lock.async_hold(const.PRIORITY_WRITE):
+            if not self._client.connected:
+                _LOGGER.debug("[BUS] {} connect ({} session(s))".format(self._key, len(self._sessions)))
+                try:
+                    await self._client.connect()
+                except Exception as e:
+                    _LOGGER.error("[BUS] {} connection error ({})".format(self._key, e))
+        if self._client.connected:
+            self._set_link(True)
+        else:
+            self.request_reconnect()
+
+    def detach(self, session:int) -> None:
+        ''' Detach a session from the connection, closed with the last one '''
+        self._listeners.pop(session, None)
+        if self._sessions.pop(session, None) is None:
+            return
+        if not self._sessions:
+            # next session on this endpoint gets a new bus, built with its own settings
+            if ModbusBus._buses.get(self._key) is self:
+                del ModbusBus._buses[self._key]
+            if self._reconnect_task is not None:
+                self._reconnect_task.cancel()
+                self._reconnect_task = None
+            if self._client.connected:
+                _LOGGER.debug("[BUS] {} close".format(self._key))
+                self._client.close()
+
+    def add_listener(self, session:int, callback) -> None:
+        ''' Call callback(up:bool) of session when the link goes down or comes back '''
+        callbacks = self._listeners.setdefault(session, [])
+        if callback not in callbacks:
+            callbacks.append(callback)
+
+    @property
+    def link_up(self) -> bool:
+        ''' Get link state (None until the first connection attempt) '''
+        return self._link_up
+
+    def _set_link(self, up:bool) -> None:
+        ''' Record link state and report a change to the listeners '''
+        if self._link_up == up:
+            return
+        self._link_up = up
+        _LOGGER.info("[BUS] {} link {}".format(self._key, "up" if up else "down"))
+        for callbacks in list(self._listeners.values()):
+            for callback in callbacks:
+                callback(up)
+
+    def request_reconnect(self) -> None:
+        ''' Link seen down: reconnect in the background, the transactions fail fast meanwhile '''
+        self._set_link(False)
+        if self._reconnect_task is None and self._sessions:
+            self._reconnect_task = asyncio.get_running_loop().create_task(self._async_reconnect())
+
+    async def _async_reconnect(self) -> None:
+        ''' Reconnect with jittered exponential backoff until the link is up or no session is left '''
+        _delay = const.RECONNECT_DELAY_MIN
+        try:
+            while self._sessions:
+                if not self._client.connected:
+                    async with self._lock.async_hold(const.PRIORITY_WRITE):
+                        try:
+                            await self._client.connect()
+                        except Exception as e:
+                            _LOGGER.debug("[BUS] {} reconnection error ({})".format(self._key, e))
+                if self._client.connected:
+                    self._reconnect_task = None
+                    self._set_link(True)
+                    return
+                # jitter: buses of a site that went down together do not reconnect in step
+                _wait = random.uniform(_delay / 2, _delay)
+                _LOGGER.debug("[BUS] {} reconnection in {:.1f}s".format(self._key, _wait))
+                await asyncio.sleep(_wait)
+                _delay = min(2 * _delay, const.RECONNECT_DELAY_MAX)
+        finally:
+            if self._reconnect_task is asyncio.current_task():
+                self._reconnect_task = None
+
+    @asynccontextmanager
+    async def transaction(self, priority:int = const.PRIORITY_POLL, session:int = None):
+        ''' Reserve the bus for one transaction, writes first then refresh reads then polls;
+            within a priority class, the session served the least goes first '''
+        rank = 0
+        if session is not None:
+            # each request of a session is queued one step after its previous one
+            rank = max(self._sessions.get(session, self._clock), self._clock)
+            if session in self._sessions:
+                self._sessions[session] = rank + 1
+        async with self._lock.async_hold(priority, rank):
+            self._clock = max(self._clock, rank)
+            yield
+
+    @property
+    def pacer(self) -> FramePacer:
+        ''' Get bus inter-frame gap scheduler '''
+        return self._pacer
+
+    @property
+    def rtt(self) -> RttEstimator:
+        ''' Get response times of the link '''
+        return self._rtt
+
+class PipelinedResponse:
+    ''' Reply of a pipelined transaction (subset of the pymodbus responses used here) '''
+
+    def __init__(self, function_code:int, registers:list = None, exception_code:int = 0) -> None:
+        ''' Class constructor '''
+        self.function_code = function_code
+        self.registers = registers if registers is not None else []
+        self.exception_code = exception_code
+
+    @classmethod
+    def decode(cls, pdu:bytes) -> 'PipelinedResponse':
+        ''' Decode a reply PDU (function code + data) '''
+        if pdu[0] & 0x80:
+            return cls(pdu[0], exception_code=pdu[1])
+        if pdu[0] == 0x03:
+            return cls(pdu[0], registers=list(struct.unpack(">{}H".format(pdu[1] // 2), pdu[2:2 + pdu[1]])))
+        # write single register (0x06): echo of the request
+        return cls(pdu[0], registers=[struct.unpack(">H", pdu[3:5])[0]])
+
+    def isError(self) -> bool:
+        ''' Modbus exception reply '''
+        return bool(self.function_code & 0x80)
+
+    def __str__(self) -> str:
+        return "PipelinedResponse(fc={}, exc={}, regs={})".format(self.function_code,
+                                                                    self.exception_code,
+                                                                    self.registers)
+
+class PipelinedTcpClient:
+    ''' Modbus TCP client keeping up to depth transactions in flight on one socket,
+        replies matched by MBAP transaction ID.
+        Falls back to one transaction at a time when the gateway reorders or drops replies '''
+
+    def __init__(self,
+                    host:str,
+                    port:int = const.DEFAULT_TCP_PORT,
+                    depth:int = const.DEFAULT_PIPELINE_DEPTH,
+                    timeout:float = 3,
+                ) -> None:
+        ''' Class constructor '''
+        self._host = host
+        self._port = port
+        self._max_depth = min(max(1, depth), const.MAX_PIPELINE_DEPTH)
+        self._configured_depth = self._max_depth
+        # one transaction at a time until the probe succeeds
+        self._depth:int = 1
+        self._probed:bool = False
+        self._timeout = timeout
+        self._reader = None
+        self._writer = None
+        self._rx_task = None
+        self._tid:int = 0
+        # transactions in flight: {transaction id: future of the reply PDU}
+        self._pending:dict = {}
+        # transaction ids in sending order, to detect reordered replies
+        self._order = deque()
+        # transaction ids cancelled by the caller, their reply is dropped when it comes
+        self._abandoned:set = set()
+        self._inflight:int = 0
+        self._gate = asyncio.Condition()
+
+    @property
+    def depth(self) -> int:
+        ''' Get number of transactions allowed in flight '''
+        return self._depth
+
+    @property
+    def probed(self) -> bool:
+        ''' Get pipelining probe status of the current connection '''
+        return self._probed
+
+    @property
+    def connected(self) -> bool:
+        ''' Get socket status '''
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self) -> bool:
+        ''' Open the socket and start reading the replies '''
+        if self.connected:
+            return True
+        try:
+            self._reader, self._writer = await asyncio.wait_for(asyncio.open_connection(self._host, self._port),
+                                                                self._timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            _LOGGER.error("[PIPELINE] connection to {}:{} failed ({})".format(self._host, self._port, e))
+            self._reader = self._writer = None
+            return False
+        # a new connection may reach a restarted or replaced gateway: probed again
+        self._probed = False
+        self._depth = 1
+        self._max_depth = self._configured_depth
+        self._rx_task = asyncio.get_running_loop().create_task(self._async_receive())
+        return True
+
+    def close(self) -> None:
+        ''' Close the socket, transactions in flight fail '''
+        if self._rx_task is not None:
+            self._rx_task.cancel()
+            self._rx_task = None
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+        self._abort(ConnectionError("Connection closed"))
+
+    def _abort(self, exc:Exception) -> None:
+        ''' Fail all transactions in flight '''
+        pending, self._pending = self._pending, {}
+        self._order.clear()
+        self._abandoned.clear()
+        for fut in pending.values():
+            if not fut.done():
+                fut.set_exception(exc)
+
+    def _fallback(self, reason:str) -> None:
+        ''' Stop pipelining on this gateway '''
+        if self._depth > 1:
+            _LOGGER.warning("[PIPELINE] {}:{} {}, back to one transaction at a time".format(self._host,
+                                                                                        self._port,
+                                                                                        reason))
+        else:
+            _LOGGER.debug("[PIPELINE] {}:{} {}".format(self._host, self._port, reason))
+        self._depth = 1
+        self._max_depth = 1
+
+    async def _async_receive(self) -> None:
+        ''' Read the replies and hand them to their transaction '''
+        try:
+            while True:
+                tid, protocol, length, _ = struct.unpack(">HHHB", await self._reader.readexactly(7))
+                if protocol != 0 or length < 2:
+                    raise ConnectionError("malformed MBAP header (protocol {}, length {})".format(protocol, length))
+                pdu = await self._reader.readexactly(length - 1)
+                fut = self._pending.pop(tid, None)
+                if fut is None and tid in self._abandoned:
+                    # reply of a transaction cancelled by its caller
+                    self._abandoned.discard(tid)
+                    continue
+                if fut is None:
+                    # reply of a transaction already timed out
+                    self._fallback("late reply (transaction id {})".format(tid))
+                    continue
+                if self._order[0] != tid:
+                    self._fallback("reordered replies")
+                self._order.remove(tid)
+                if not fut.done():
+                    fut.set_result(pdu)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # lost socket or reply stream out of sync: the socket is closed, reconnected by the bus
+            _LOGGER.error("[PIPELINE] connection to {}:{} lost ({})".format(self._host, self._port, e))
+            self._rx_task = None
+            if self._writer is not None:
+                self._writer.close()
+            self._reader = self._writer = None
+            self._abort(ConnectionError("Connection lost"))
+
+    def _next_tid(self) -> int:
+        ''' Get a transaction id not in flight '''
+        while True:
+            self._tid = (self._tid + 1) & 0xFFFF
+            if self._tid not in self._pending and self._tid not in self._abandoned:
+                return self._tid
+
+    async def _async_execute(self, device_id:int, pdu:bytes, timeout:float = None) -> bytes:
+        ''' Send one request and wait for its reply (timeout seconds, client timeout if None),
+            at most depth in flight '''
+        async with self._gate:
+            await self._gate.wait_for(lambda: self._inflight < self._depth)
+            self._inflight += 1
+        try:
+            if not self.connected:
+                raise ConnectionError("Client not connected")
+            tid = self._next_tid()
+            fut = asyncio.get_running_loop().create_future()
+            self._pending[tid] = fut
+            self._order.append(tid)
+            self._writer.write(struct.pack(">HHHB", tid, 0, len(pdu) + 1, device_id) + pdu)
+            try:
+                await self._writer.drain()
+                return await asyncio.wait_for(fut, timeout if timeout is not None else self._timeout)
+            except asyncio.TimeoutError:
+                if self._inflight > 1:
+                    self._fallback("reply dropped")
+                raise
+            except asyncio.CancelledError:
+                if self._pending.get(tid) is fut:
+                    self._abandoned.add(tid)
+                raise
+            finally:
+                # whatever the exit (reply, timeout, cancellation, lost socket), the id is no longer awaited
+                if self._pending.get(tid) is fut:
+                    del self._pending[tid]
+                if tid in self._order:
+                    self._order.remove(tid)
+        finally:
+            # released before taking the lock, a second cancellation cannot leak the slot
+            self._inflight -= 1
+            async with self._gate:
+                self._gate.notify_all()
+
+    async def read_holding_registers(self,
+                                        address:int,
+                                        count:int = 1,
+                                        device_id:int = 1,
+                                        timeout:float = None,
+                                        ) -> PipelinedResponse:
+        ''' Read holding registers (code 0x03) '''
+        return PipelinedResponse.decode(await self._async_execute(device_id,
+                                                                    struct.pack(">BHH", 0x03, address, count),
+                                                                    timeout))
+
+    async def write_register(self,
+                                address:int,
+                                value:int,
+                                device_id:int = 1,
+                                timeout:float = None,
+                                ) -> PipelinedResponse:
+        ''' Write one register (code 0x06) '''
+        return PipelinedResponse.decode(await self._async_execute(device_id,
+                                                                    struct.pack(">BHH", 0x06, address, value),
+                                                                    timeout))
+
+    async def async_probe(self, device_id:int, address:int = const.REG_SYS_STATE) -> bool:
+        ''' Detect pipelining support: send depth reads back to back,
+            the gateway supports it if every reply comes back, in order '''
+        if self._probed or self._max_depth <= 1:
+            return self._depth > 1
+        self._probed = True
+        self._depth = self._max_depth
+        rets = await asyncio.gather(*(self.read_holding_registers(address, 1, device_id) for _ in range(self._max_depth)),
+                                    return_exceptions=True)
+        if self._depth > 1 and all(isinstance(rr, PipelinedResponse) and not rr.isError() for rr in rets):
+            _LOGGER.info("[PIPELINE] {}:{} pipelining enabled (depth {})".format(self._host, self._port, self._depth))
+            return True
+        self._fallback("does not support pipelining")
+        return False
+
+class WriteJournal:
+    ''' Writes that did not reach the controller: last value per register and the bits
+        it changes, replayed by priority then age once it answers again, dropped when too old '''
+
+    def __init__(self, max_age:float = const.JOURNAL_MAX_AGE) -> None:
+        ''' Class constructor '''
+        self._max_age = max_age
+        # {reg: [val, priority, wall clock time of the intent, mask of the bits to write]}
+        self._entries:dict = {}
+        self._listener = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def set_listener(self, callback) -> None:
+        ''' Call callback() when the journal changes (to save it) '''
+        self._listener = callback
+
+    def _changed(self) -> None:
+        if self._listener is not None:
+            self._listener()
+
+    def record(self,
+                reg:int,
+                val:int,
+                priority:int = const.PRIORITY_WRITE,
+                mask:int = const.REG_MASK_FULL,
+                ) -> None:
+        ''' Keep the last value intended for the mask bits of reg,
+            merged with the bits journaled before '''
+        entry = self._entries.get(reg)
+        _stamp = time.time()
+        if entry is not None:
+            priority = min(priority, entry[1])
+            if (entry[0] ^ val) & mask == 0 and entry[3] == mask:
+                # same intent failing again (replay): its age goes on
+                _stamp = entry[2]
+            val = (entry[0] & ~mask) | (val & mask)
+            mask |= entry[3]
+        self._entries[reg] = [val, priority, _stamp, mask]
+        _LOGGER.warning("write register {} - Val: {} journaled, replayed when the controller answers".format(hex(reg), hex(val)))
+        self._changed()
+
+    def discard(self, reg:int) -> None:
+        ''' Forget reg (written since) '''
+        if self._entries.pop(reg, None) is not None:
+            self._changed()
+
+    def get(self, reg:int) -> int:
+        ''' Get the value journaled for reg, None if any '''
+        entry = self._entries.get(reg)
+        return entry[0] if entry is not None else None
+
+    def mask(self, reg:int) -> int:
+        ''' Get the bits journaled for reg, 0 if any '''
+        entry = self._entries.get(reg)
+        return entry[3] if entry is not None else 0
+
+    def due(self) -> list:
+        ''' Get the writes to replay [(reg, val, priority, mask)], most urgent and oldest first.
+            Intents older than the maximum age are dropped '''
+        _now = time.time()
+        for reg, (val, _, stamp, _) in list(self._entries.items()):
+            if _now - stamp > self._max_age:
+                _LOGGER.warning("journaled write register {} - Val: {} too old, dropped".format(hex(reg), hex(val)))
+                del self._entries[reg]
+                self._changed()
+        return [(reg, entry[0], entry[1], entry[3]) for reg, entry in sorted(self._entries.items(),
+                                                                                key=lambda item: (item[1][1], item[1][2]))]
+
+    def dump(self) -> list:
+        ''' Get the journal as saved to storage [[reg, val, priority, time, mask]] '''
+        return [[reg] + entry for reg, entry in self._entries.items()]
+
+    def load(self, entries:list) -> bool:
+        ''' Load a journal saved by a previous run (saved without mask: whole registers) '''
+        if not isinstance(entries, list) \
+            or not all(isinstance(entry, list) and len(entry) in (4, 5) for entry in entries):
+            return False
+        self._entries = {int(entry[0]): [int(entry[1]),
+                                            int(entry[2]),
+                                            float(entry[3]),
+                                            int(entry[4]) if len(entry) == 5 else const.REG_MASK_FULL]
+                            for entry in entries}
+        return True
+
+class CircuitBreaker:
+    ''' Stop waiting for a controller that does not answer: closed (normal),
+        open (fail fast), half-open (one probe read decides) '''
+
+    def __init__(self,
+                    name:str = "",
+                    threshold:int = const.CIRCUIT_FAILURE_THRESHOLD,
+                    period:float = const.CIRCUIT_OPEN_PERIOD,
+                    period_max:float = const.CIRCUIT_OPEN_PERIOD_MAX,
+                ) -> None:
+        ''' Class constructor '''
+        self._name = name
+        self._threshold = threshold
+        self._base_period = period
+        self._period_max = period_max
+        self._period = period
+        self._state = const.CircuitState.CLOSED
+        self._failures:int = 0
+        self._opened_at:float = 0.0
+
+    @property
+    def state(self) -> const.CircuitState:
+        ''' Get circuit state '''
+        return self._state
+
+    def probe_due(self) -> bool:
+        ''' open circuit whose period elapsed: time to probe the controller '''
+        return self._state == const.CircuitState.OPEN \
+            and time.monotonic() - self._opened_at >= self._period
+
+    def half_open(self) -> None:
+        ''' one probe in flight, the other requests still fail fast '''
+        self._state = const.CircuitState.HALF_OPEN
+
+    def abort_probe(self) -> None:
+        ''' probe not sent or cancelled (link down, unload): open again, probe due at once '''
+        if self._state == const.CircuitState.HALF_OPEN:
+            self._state = const.CircuitState.OPEN
+
+    def success(self) -> None:
+        ''' the controller answered '''
+        if self._state != const.CircuitState.CLOSED:
+            _LOGGER.warning("[CIRCUIT] {} answers again, circuit closed".format(self._name))
+        self._state = const.CircuitState.CLOSED
+        self._failures = 0
+        self._period = self._base_period
+
+    def failure(self) -> None:
+        ''' the controller did not answer '''
+        self._failures += 1
+        if self._state == const.CircuitState.HALF_OPEN:
+            self._period = min(2 * self._period, self._period_max)
+            self._open()
+        elif self._state == const.CircuitState.CLOSED and self._failures >= self._threshold:
+            self._open()
+
+    def _open(self) -> None:
+        ''' fail fast for the open period '''
+        _LOGGER.warning("[CIRCUIT] {} does not answer, circuit open for {}s".format(self._name, self._period))
+        self._state = const.CircuitState.OPEN
+        self._opened_at = time.monotonic()
+
+class AreaView:
+    ''' Read-only area of a registers snapshot, fields decoded on access '''
+
+    __slots__ = ('_regs', '_base', '_id')
+
+    def __init__(self, regs:array, id_zone:int) -> None:
+        ''' Class constructor '''
+        self._regs = regs
+        self._base = const.REG_START_ZONE + const.NUM_REG_PER_ZONE * (id_zone - 1)
+        self._id = id_zone
+
+    def __repr__(self) -> str:
+        ''' repr method '''
+        return repr({'id': self._id, 'state': self.state, 'register': self.register,
+                        'fan': self.fan_mode, 'clim': self.clim_mode,
+                        'order_temp': self.order_temp, 'real_temp': self.real_temp})
+
+    @property
+    def id_zone(self) -> int:
+        ''' Get area id '''
+        return self._id
+
+    @property
+    def registered(self) -> bool:
+        ''' test if the area is registered on the controller '''
+        return bool((self._regs[self._base + const.REG_LOCK_ZONE] >> 1) & 0b1)
+
+    @property
+    def state(self) -> const.ZoneState:
+        ''' Get area state, None if unknown '''
+        return const.ZONE_LOCK_CODEC.decode(self._regs[self._base + const.REG_LOCK_ZONE])[0]
+
+    @property
+    def register(self) -> const.ZoneRegister:
+        ''' Get area register, None if unknown '''
+        return const.ZONE_LOCK_CODEC.decode(self._regs[self._base + const.REG_LOCK_ZONE])[1]
+
+    @property
+    def fan_mode(self) -> const.ZoneFanMode:
+        ''' Get area fan mode, None if unknown '''
+        return const.ZONE_STATE_AND_FLOW_CODEC.decode(self._regs[self._base + const.REG_STATE_AND_FLOW])[0]
+
+    @property
+    def clim_mode(self) -> const.ZoneClimMode:
+        ''' Get area climate mode, None if unknown '''
+        return const.ZONE_STATE_AND_FLOW_CODEC.decode(self._regs[self._base + const.REG_STATE_AND_FLOW])[1]
+
+    @property
+    def order_temp(self) -> float:
+        ''' Get area order temperature '''
+        return self._regs[self._base + const.REG_TEMP_ORDER] / 2
+
+    @property
+    def real_temp(self) -> float:
+        ''' Get area real temperature '''
+        return self._regs[self._base + const.REG_TEMP_REAL] / 2
+
+    def same(self, regs:array) -> bool:
+        ''' test if the area registers hold the same values in another snapshot '''
+        _end = self._base + const.NUM_REG_PER_ZONE
+        return self._regs[self._base:_end] == regs[self._base:_end]
+
+class EngineView:
+    ''' Read-only engine of a registers snapshot, fields decoded on access '''
+
+    __slots__ = ('_regs', '_idx')
+
+    def __init__(self, regs:array, engine_id:int) -> None:
+        ''' Class constructor '''
+        self._regs = regs
+        self._idx = engine_id - 1
+
+    def __repr__(self) -> str:
+        ''' repr method '''
+        return repr({'id': self.engine_id, 'throughput': self.throughput,
+                        'state': self.state, 'order_temp': self.order_temp})
+
+    @property
+    def engine_id(self) -> int:
+        ''' Get engine id '''
+        return self._idx + 1
+
+    @property
+    def throughput(self) -> int:
+        ''' Get engine throughput, None if out of range '''
+        return const.THROUGHPUT_CODEC.decode(self._regs[const.REG_START_FLOW_ENGINE + self._idx])[0]
+
+    @property
+    def state(self) -> const.FlowEngine:
+        ''' Get engine state, None if unknown '''
+        return const.FLOW_ENGINE_CODEC.decode(self._regs[const.REG_START_FLOW_STATE_ENGINE + self._idx])[0]
+
+    @property
+    def order_temp(self) -> float:
+        ''' Get engine order temperature '''
+        return self._regs[const.REG_START_ORDER_TEMP + self._idx] / 2
+
+    def same(self, regs:array) -> bool:
+        ''' test if the engine registers hold the same values in another snapshot '''
+        return all(self._regs[reg + self._idx] == regs[reg + self._idx]
+                    for reg in (const.REG_START_FLOW_ENGINE,
+                                const.REG_START_FLOW_STATE_ENGINE,
+                                const.REG_START_ORDER_TEMP))
+
+class RegisterSnapshot:
+    ''' Immutable registers map (40001 -> 40082) packed in one array of 16 bits words.
+        Areas and engines views are built on demand and kept, views whose registers
+        did not change are shared with the previous snapshot '''
+
+    __slots__ = ('_regs', '_areas', '_engines', '_hash')
+
+    def __init__(self, regs:array) -> None:
+        ''' Class constructor, use from_values '''
+        self._regs = regs
+        self._areas:dict = {}
+        self._engines:dict = {}
+        self._hash = None
+
+    @classmethod
+    def from_values(cls,
+                    values,
+                    previous:'RegisterSnapshot' = None,
+                    ) -> 'RegisterSnapshot':
+        ''' Build a snapshot from registers values, previous is returned as is if nothing changed '''
+        regs = array('H', values)
+        if len(regs) != const.NB_REG_TOTAL:
+            raise ValueError('Registers map must hold {} registers'.format(const.NB_REG_TOTAL))
+        if previous is not None and previous._regs == regs:
+            return previous
+        snap = cls(regs)
+        if previous is not None:
+            # unchanged views keep pointing to the previous array, never modified
+            snap._areas = {k: v for k, v in previous._areas.items() if v.same(regs)}
+            snap._engines = {k: v for k, v in previous._engines.items() if v.same(regs)}
+        return snap
+
+    def __eq__(self, other) -> bool:
+        ''' compare registers values '''
+        if not isinstance(other, RegisterSnapshot):
+            return NotImplemented
+        return self is other or self._regs == other._regs
+
+    def __hash__(self) -> int:
+        ''' hash of the registers values '''
+        if self._hash is None:
+            self._hash = hash(self._regs.tobytes())
+        return self._hash
+
+    def __len__(self) -> int:
+        return len(self._regs)
+
+    def __getitem__(self, reg:int) -> int:
+        return self._regs[reg]
+
+    def __repr__(self) -> str:
+        ''' repr method '''
+        return "RegisterSnapshot({})".format(self._regs.tolist())
+
+    def diff(self, other:'RegisterSnapshot') -> set:
+        ''' Get registers whose value differs from another snapshot '''
+        if other is self:
+            return set()
+        return {reg for reg, (val, old) in enumerate(zip(self._regs, other._regs)) if val != old}
+
+    def area(self, id_zone:int) -> AreaView:
+        ''' Get area view from id (1 -> 16) '''
+        view = self._areas.get(id_zone)
+        if view is None:
+            if not 0 < id_zone <= const.NB_ZONE_MAX:
+                raise ValueError('Zone Id must be between 1 to {}'.format(const.NB_ZONE_MAX))
+            view = self._areas[id_zone] = AreaView(self._regs, id_zone)
+        return view
+
+    def areas(self) -> list:
+        ''' Get views of the areas registered on the controller '''
+        return [self.area(id_zone) for id_zone in range(1, const.NB_ZONE_MAX + 1)
+                    if (self._regs[const.REG_START_ZONE + const.NUM_REG_PER_ZONE * (id_zone - 1) + const.REG_LOCK_ZONE] >> 1) & 0b1]
+
+    def engine(self, engine_id:int) -> EngineView:
+        ''' Get engine view from id (1 -> 4) '''
+        view = self._engines.get(engine_id)
+        if view is None:
+            if not 0 < engine_id <= const.NUM_OF_ENGINES:
+                raise ValueError('Engine Id must be between 1 to {}'.format(const.NUM_OF_ENGINES))
+            view = self._engines[engine_id] = EngineView(self._regs, engine_id)
+        return view
+
+    def invalid(self) -> list:
+        ''' Get registers holding a value that cannot be decoded (registered areas, engines and system) '''
+        _checks = [(const.REG_START_ZONE + const.NUM_REG_PER_ZONE * (view.id_zone - 1) + offset, codec)
+                        for view in self.areas()
+                        for offset, codec in ((const.REG_LOCK_ZONE, const.ZONE_LOCK_CODEC),
+                                                (const.REG_STATE_AND_FLOW, const.ZONE_STATE_AND_FLOW_CODEC))]
+        _checks += [(const.REG_START_FLOW_STATE_ENGINE + idx, const.FLOW_ENGINE_CODEC) for idx in range(const.NUM_OF_ENGINES)]
+        _checks += [(const.REG_START_FLOW_ENGINE + idx, const.THROUGHPUT_CODEC) for idx in range(const.NUM_OF_ENGINES)]
+        _checks += [(const.REG_GLOBAL_MODE, const.GLOBAL_MODE_CODEC),
+                    (const.REG_EFFICIENCY, const.EFFICIENCY_CODEC),
+                    (const.REG_SYS_STATE, const.SYS_STATE_CODEC)]
+        return [reg for reg, codec in _checks if None in codec.decode(self._regs[reg])]
+
+    @property
+    def global_mode(self) -> const.GlobalMode:
+        ''' Get global mode, None if unknown '''
+        return const.GLOBAL_MODE_CODEC.decode(self._regs[const.REG_GLOBAL_MODE])[0]
+
+    @property
+    def efficiency(self) -> const.Efficiency:
+        ''' Get efficiency, None if unknown '''
+        return const.EFFICIENCY_CODEC.decode(self._regs[const.REG_EFFICIENCY])[0]
+
+    @property
+    def sys_state(self) -> const.SysState:
+        ''' Get system state, None if unknown '''
+        return const.SYS_STATE_CODEC.decode(self._regs[const.REG_SYS_STATE])[0]
+
+class RegisterImage:
+    ''' Shadow copy of the controller holding registers '''
+
+    def __init__(self, size:int = const.NB_REG_TOTAL) -> None:
+        ''' Class constructor '''
+        self._values:list = [None] * size
+        # monotonic time the register was seen on the bus, None if never (unknown or restored)
+        self._stamps:list = [None] * size
+        # last snapshot built, shared with the next one when nothing changed
+        self._snapshot:RegisterSnapshot = None
+
+    def update(self, start:int, values) -> None:
+        ''' Store values read from or written to the controller '''
+        _now = time.monotonic()
+        for idx, val in enumerate(values, start):
+            if 0 <= idx < len(self._values):
+                self._values[idx] = val
+                self._stamps[idx] = _now
+
+    def restore(self, values:list) -> bool:
+        ''' Load values saved by a previous run, never used to compose a write '''
+        if not isinstance(values, list) or len(values) != len(self._values) \
+            or not all(isinstance(val, int) for val in values):
+            return False
+        self._values = list(values)
+        self._stamps = [None] * len(values)
+        return True
+
+    def get(self, reg:int, max_age:float = None) -> int:
+        ''' Get register value seen on the bus, None if unknown, restored or older than max_age seconds '''
+        if reg < 0 or reg >= len(self._values) or self._stamps[reg] is None:
+            return None
+        if max_age is not None and time.monotonic() - self._stamps[reg] > max_age:
+            return None
+        return self._values[reg]
+
+    def age(self, reg:int) -> float:
+        ''' Get seconds elapsed since the register was last seen on the bus '''
+        if self._stamps[reg] is None:
+            return None
+        return time.monotonic() - self._stamps[reg]
+
+    @property
+    def values(self) -> list:
+        ''' Get a copy of the registers values, read or restored (None when unknown) '''
+        return list(self._values)
+
+    def snapshot(self) -> RegisterSnapshot:
+        ''' Get an immutable snapshot of the registers values, None until the whole map is known '''
+        if None in self._values:
+            return None
+        self._snapshot = RegisterSnapshot.from_values(self._values, self._snapshot)
+        return self._snapshot
+
+class ReadCoalescer:
+    ''' Single-flight reads: a read covered by a span already in flight shares its result,
+        reads requested within the window are merged into the fewest spans '''
+
+    def __init__(self, read, window:float = const.DEFAULT_READ_WINDOW) -> None:
+        ''' Class constructor
+            read: coroutine reading a span on the bus (start, count, priority) -> (list, bool) '''
+        self._read = read
+        self._window = window
+        # spans in flight: [start, count, future of {reg: val}]
+        self._inflight:list = []
+        # registers waiting for the window to elapse
+        self._batch_regs:set = set()
+        self._batch_priority:int = const.PRIORITY_POLL
+        self._batch_fut = None
+        self._batch_task = None
+
+    def _covering(self, reg:int) -> list:
+        ''' Get the in flight span containing reg '''
+        for span in self._inflight:
+            if span[0] <= reg < span[0] + span[1]:
+                return span
+        return None
+
+    async def async_read(self,
+                            start:int,
+                            count:int,
+                            priority:int = const.PRIORITY_REFRESH,
+                            ) -> (list, bool):
+        ''' Read count registers from start '''
+        _futs = []
+        _missing = []
+        for reg in range(start, start + count):
+            span = self._covering(reg)
+            if span is None:
+                _missing.append(reg)
+            elif span[2] not in _futs:
+                _futs.append(span[2])
+        if _missing:
+            if self._batch_fut is None:
+                self._batch_fut = asyncio.get_running_loop().create_future()
+                self._batch_fut.add_done_callback(ReadCoalescer._consume)
+                self._batch_task = asyncio.create_task(self._async_flush())
+            self._batch_regs.update(_missing)
+            self._batch_priority = min(self._batch_priority, priority)
+            _futs.append(self._batch_fut)
+        _vals:dict = {}
+        for fut in _futs:
+            # shielded: a cancelled reader must not cancel the shared read
+            _vals.update(await asyncio.shield(fut))
+        if any(reg not in _vals for reg in range(start, start + count)):
+            return None, False
+        return [_vals[reg] for reg in range(start, start + count)], True
+
+    async def _async_flush(self) -> None:
+        ''' Read the registers batched during the window '''
+        await asyncio.sleep(self._window)
+        fut, regs, priority = self._batch_fut, self._batch_regs, self._batch_priority
+        self._batch_fut, self._batch_regs, self._batch_priority = None, set(), const.PRIORITY_POLL
+        _loop = asyncio.get_running_loop()
+        spans = [[_start, _count, _loop.create_future()] for _start, _count in plan_read_spans(regs)]
+        for span in spans:
+            span[2].add_done_callback(ReadCoalescer._consume)
+        self._inflight.extend(spans)
+        # spans are requested together, the bus decides how many are in flight at once
+        await asyncio.gather(*(self._async_read_span(span, priority) for span in spans))
+        _vals:dict = {}
+        _exc = None
+        for span in spans:
+            if span[2].exception():
+                _exc = _exc or span[2].exception()
+            else:
+                _vals.update(span[2].result())
+        if _exc is not None:
+            fut.set_exception(_exc)
+        else:
+            fut.set_result(_vals)
+
+    async def _async_read_span(self, span:list, priority:int) -> None:
+        ''' Read one span on the bus and resolve its future '''
+        try:
+            vals, ret = await self._read(span[0], span[1], priority)
+            span[2].set_result(dict(enumerate(vals, span[0])) if ret else {})
+        except Exception as e:
+            span[2].set_exception(e)
+        finally:
+            self._inflight.remove(span)
+
+    @staticmethod
+    def _consume(fut) -> None:
+        ''' retrieve the exception of a shared read even if all its readers were cancelled '''
+        if not fut.cancelled():
+            fut.exception()
+
+class WriteCoalescer:
+    ''' Write coalescing: only the last value written to a register within the window
+        is sent, in one transaction acknowledged to every writer '''
+
+    def __init__(self, write, window:float = const.DEFAULT_WRITE_WINDOW) -> None:
+        ''' Class constructor
+            write: coroutine writing one register on the bus (reg, val, priority, mask) -> bool '''
+        self._write = write
+        self._window = window
+        # registers waiting for the window to elapse: {reg: [val, priority, future, mask]}
+        self._pending:dict = {}
+        self._tasks:set = set()
+
+    def pending(self, reg:int) -> int:
+        ''' Get the value waiting to be written to reg, None if any '''
+        entry = self._pending.get(reg)
+        return entry[0] if entry is not None else None
+
+    async def async_write(self,
+                            reg:int,
+                            val:int,
+                            priority:int = const.PRIORITY_WRITE,
+                            mask:int = const.REG_MASK_FULL,
+                            ) -> bool:
+        ''' Write val to reg (mask: bits changed by the writer), resolved on the bus acknowledge '''
+        entry = self._pending.get(reg)
+        if entry is None:
+            entry = [val, priority, asyncio.get_running_loop().create_future(), mask]
+            entry[2].add_done_callback(ReadCoalescer._consume)
+            self._pending[reg] = entry
+            task = asyncio.create_task(self._async_flush(reg))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            _LOGGER.debug("coalesce write register: {} - Val: {} -> {}".format(hex(reg), hex(entry[0]), hex(val)))
+            entry[0] = val
+            entry[1] = min(entry[1], priority)
+            entry[3] |= mask
+        return await asyncio.shield(entry[2])
+
+    async def _async_flush(self, reg:int) -> None:
+        ''' Write the last value of reg once the window elapsed '''
+        await asyncio.sleep(self._window)
+        val, priority, fut, mask = self._pending.pop(reg)
+        try:
+            fut.set_result(await self._write(reg, val, priority, mask))
+        except Exception as e:
+            fut.set_exception(e)
+
 class Operations:
     ''' koolnova BMS Modbus operations class '''
 
@@ -31,7 +1247,10 @@ class Operations:
     _tcp_retries:int=const.DEFAULT_TCP_RETRIES
     _tcp_reco_delay_min:float=const.DEFAULT_TCP_RECO_DELAY
     _tcp_reco_delay_max:float=const.DEFAULT_TCP_RECO_DELAY_MAX
-    _lock = asyncio.Lock()
+    _frame_gap:float=const.DEFAULT_FRAME_GAP
+    _shadow_max_age:float=const.DEFAULT_SHADOW_MAX_AGE
+    _read_window:float=const.DEFAULT_READ_WINDOW
+    _write_window:float=const.DEFAULT_WRITE_WINDOW
 
     def __init__(self, mode:str, timeout:int, debug:bool=False, **kwargs) -> None:
         ''' Class constructor '''
@@ -40,6 +1259,19 @@ class Operations:
         self._debug = debug
         self.__dict__.update(kwargs)
         _LOGGER.debug("[OPERATION] dict: {}".format(self.__dict__))
+        self._frame_gap = kwargs.get('frame_gap', const.DEFAULT_FRAME_GAP)
+        self._shadow_max_age = kwargs.get('shadow_max_age', const.DEFAULT_SHADOW_MAX_AGE)
+        self._image = RegisterImage()
+        self._read_window = kwargs.get('read_window', const.DEFAULT_READ_WINDOW)
+        self._reads = ReadCoalescer(self.__async_bus_read_registers, self._read_window)
+        self._write_window = kwargs.get('write_window', const.DEFAULT_WRITE_WINDOW)
+        self._writes = WriteCoalescer(self.__async_bus_write_register, self._write_window)
+        self._journal = WriteJournal()
+        self._replay_task = None
+        # pipelining probe of a new connection in progress
+        self._probe_task = None
+        # registers written since the last read back: {reg: val}
+        self._written:dict = {}
         if self._mode == 'Modbus RTU':
             self._addr = kwargs.get('addr', const.DEFAULT_ADDR)
             self._rtu_port = kwargs.get('port', "")
@@ -47,12 +1279,47 @@ class Operations:
             self._rtu_parity = kwargs.get('parity', const.DEFAULT_PARITY)
             self._rtu_bytesize = kwargs.get('bytesize', const.DEFAULT_BYTESIZE)
             self._rtu_stopbits = kwargs.get('stopbits', const.DEFAULT_STOPBITS)
-            self._client = ModbusClient(port=self._rtu_port,
-                                        baudrate=self._rtu_baudrate,
-                                        parity=self._rtu_parity,
-                                        stopbits=self._rtu_stopbits,
-                                        bytesize=self._rtu_bytesize,
-                                        timeout=self._timeout)
+            self._bus = ModbusBus.get(ModbusBus.serial_key(self._rtu_port),
+                                        FramePacer(mode=self._mode,
+                                                    gap=self._frame_gap,
+                                                    baudrate=self._rtu_baudrate,
+                                                    bytesize=self._rtu_bytesize,
+                                                    parity=self._rtu_parity,
+                                                    stopbits=self._rtu_stopbits),
+                                        lambda: ModbusClient(port=self._rtu_port,
+                                                                baudrate=self._rtu_baudrate,
+                                                                parity=self._rtu_parity,
+                                                                stopbits=self._rtu_stopbits,
+                                                                bytesize=self._rtu_bytesize,
+                                                                timeout=self._timeout))
+        elif self._mode == 'Modbus RTU over TCP':
+            self._tcp_port = kwargs.get('port',const.DEFAULT_RTU_TCP_PORT)
+            self._tcp_addr = kwargs.get('addr',const.DEFAULT_TCP_ADDR)
+            self._addr = kwargs.get('modbus',const.DEFAULT_ADDR) # Modbus slave ID for the operations
+            self._tcp_retries = kwargs.get('retries',const.DEFAULT_TCP_RETRIES)
+            self._tcp_reco_delay_min = kwargs.get('reco_delay_min',const.DEFAULT_TCP_RECO_DELAY)
+            self._tcp_reco_delay_max = kwargs.get('reco_delay_max',const.DEFAULT_TCP_RECO_DELAY_MAX)
+            # serial line behind the gateway, for the timing of the frames
+            self._rtu_baudrate = kwargs.get('baudrate', const.DEFAULT_BAUDRATE)
+            self._rtu_parity = kwargs.get('parity', const.DEFAULT_PARITY)
+            self._rtu_bytesize = kwargs.get('bytesize', const.DEFAULT_BYTESIZE)
+            self._rtu_stopbits = kwargs.get('stopbits', const.DEFAULT_STOPBITS)
+            # raw RTU frames (CRC included) over the socket, no Modbus TCP conversion in the gateway
+            self._bus = ModbusBus.get(ModbusBus.tcp_key(self._tcp_addr, self._tcp_port, "rtutcp"),
+                                        FramePacer(mode=self._mode,
+                                                    gap=self._frame_gap,
+                                                    baudrate=self._rtu_baudrate,
+                                                    bytesize=self._rtu_bytesize,
+                                                    parity=self._rtu_parity,
+                                                    stopbits=self._rtu_stopbits),
+                                        lambda: ModbusTcpClient(host=self._tcp_addr,
+                                                                port=self._tcp_port,
+                                                                framer=FramerType.RTU,
+                                                                name="koolnovaRTUoverTCP",
+                                                                retries=self._tcp_retries,
+                                                                reconnect_delay=self._tcp_reco_delay_min,
+                                                                reconnect_delay_max=self._tcp_reco_delay_max,
+                                                                timeout=self._timeout))
         elif self._mode == 'Modbus TCP':
             self._tcp_port = kwargs.get('port',const.DEFAULT_TCP_PORT)
             self._tcp_addr = kwargs.get('addr',const.DEFAULT_TCP_ADDR)
@@ -60,58 +1327,138 @@ class Operations:
             self._tcp_retries = kwargs.get('retries',const.DEFAULT_TCP_RETRIES)
             self._tcp_reco_delay_min = kwargs.get('reco_delay_min',const.DEFAULT_TCP_RECO_DELAY)
             self._tcp_reco_delay_max = kwargs.get('reco_delay_max',const.DEFAULT_TCP_RECO_DELAY_MAX)
-            self._client = ModbusTcpClient(host=self._tcp_addr,
-                                            port=self._tcp_port,
-                                            name="koolnovaTCP",
-                                            retries=self._tcp_retries,
-                                            reconnect_delay=self._tcp_reco_delay_min,
-                                            reconnect_delay_max=self._tcp_reco_delay_max,
-                                            timeout=self._timeout)
+            self._pipeline_depth = kwargs.get('pipeline_depth',const.DEFAULT_PIPELINE_DEPTH)
+            if self._pipeline_depth > 1:
+                # several transactions in flight, matched by MBAP transaction ID
+                self._bus = ModbusBus.get(ModbusBus.tcp_key(self._tcp_addr, self._tcp_port),
+                                            FramePacer(mode=self._mode, gap=self._frame_gap),
+                                            lambda: PipelinedTcpClient(host=self._tcp_addr,
+                                                                        port=self._tcp_port,
+                                                                        depth=self._pipeline_depth,
+                                                                        timeout=self._timeout))
+            else:
+                self._bus = ModbusBus.get(ModbusBus.tcp_key(self._tcp_addr, self._tcp_port),
+                                            FramePacer(mode=self._mode, gap=self._frame_gap),
+                                            lambda: ModbusTcpClient(host=self._tcp_addr,
+                                                                    port=self._tcp_port,
+                                                                    name="koolnovaTCP",
+                                                                    retries=self._tcp_retries,
+                                                                    reconnect_delay=self._tcp_reco_delay_min,
+                                                                    reconnect_delay_max=self._tcp_reco_delay_max,
+                                                                    timeout=self._timeout))
         else:
             raise InitialisationError('Mode ({}) not defined'.format(self._mode))
+        # connection shared by every slave ID on the same endpoint, this instance is one session
+        self._client = self._bus.client
+        self._session = self._bus.open_session()
+        self._breaker = CircuitBreaker(name="{} slave {}".format(self._bus.key, self._addr))
         if self._debug:
             pymodbus_apply_logging_config("DEBUG")
 
-    async def __async_read_register(self, reg:int) -> (int, bool):
+    async def __async_read_register(self,
+                                    reg:int,
+                                    priority:int = const.PRIORITY_REFRESH,
+                                    ) -> (int, bool):
         ''' Read one holding register (code 0x03) '''
-        async with Operations._lock:
-            rr = None
-            if not self._client.connected:
-                raise ModbusConnexionError('Client Modbus not connected')
-            try:
-                await asyncio.sleep(0.3)
-                _LOGGER.debug("reading holding register: {} - Slave: {}".format(hex(reg), self._addr))
-                rr = await self._client.read_holding_registers(address=reg, count=1, device_id=self._addr)
-                if rr.isError():
-                    _LOGGER.error("reading holding register error")
-                    return None, False
-            except Exception as e:
-                _LOGGER.error("Modbus Error: {}".format(e))
-                return None, False
+        regs, ret = await self.__async_read_registers(start_reg=reg, count=1, priority=priority)
+        if not ret:
+            return None, False
+        return regs[0], True
 
-            if isinstance(rr, ExceptionResponse):
-                _LOGGER.error("Received modbus exception ({})".format(rr))
-                return None, False
-            elif not rr:
-                _LOGGER.error("Response Null")
-                return None, False
-            return rr.registers[0], True
+    async def __async_read_registers(self,
+                                        start_reg:int,
+                                        count:int,
+                                        priority:int = const.PRIORITY_REFRESH,
+                                        ) -> (list, bool):
+        ''' Read holding registers (code 0x03), shared with identical or overlapping reads in flight '''
+        return await self._reads.async_read(start_reg, count, priority)
 
-    async def __async_read_registers(self, start_reg:int, count:int) -> (int, bool):
-        ''' Read holding registers (code 0x03) '''
-        async with Operations._lock:
+    async def __async_circuit_closed(self) -> bool:
+        ''' Test if the controller may be requested, probed with one cheap read once the open period elapsed '''
+        if self._breaker.state == const.CircuitState.CLOSED:
+            return True
+        if not self._breaker.probe_due():
+            return False
+        self._breaker.half_open()
+        _LOGGER.debug("probing slave {}".format(self._addr))
+        try:
+            await self.__async_bus_read_registers(start_reg=const.REG_SYS_STATE,
+                                                    count=1,
+                                                    priority=const.PRIORITY_REFRESH,
+                                                    probe=True)
+        finally:
+            # no answer nor timeout (link down, cancelled): never left half-open
+            self._breaker.abort_probe()
+        return self._breaker.state == const.CircuitState.CLOSED
+
+    @contextmanager
+    def __client_deadline(self, deadline:float):
+        ''' Give the transaction deadline to the client, yield the request keyword arguments.
+            A pymodbus request cancelled from outside fails with ModbusIOException
+            and its late reply may be taken for the answer of the next request '''
+        if isinstance(self._client, PipelinedTcpClient):
+            yield {'timeout': deadline}
+            return
+        # one transaction at a time on this client (bus lock held),
+        # the configured timeout is also the connection timeout: restored afterwards
+        _params = self._client.ctx.comm_params
+        _timeout, _params.timeout_connect = _params.timeout_connect, deadline
+        try:
+            yield {}
+        finally:
+            _params.timeout_connect = _timeout
+
+    @staticmethod
+    def __timed_out(exc:Exception, start:float, deadline:float) -> bool:
+        ''' test if a transaction failed for lack of answer before its deadline
+            (pymodbus reports its own timeouts as ModbusIOException) '''
+        return isinstance(exc, asyncio.TimeoutError) or time.monotonic() - start >= deadline
+
+    async def __async_bus_read_registers(self,
+                                            start_reg:int,
+                                            count:int,
+                                            priority:int = const.PRIORITY_REFRESH,
+                                            probe:bool = False,
+                                            ) -> (list, bool):
+        ''' Read holding registers (code 0x03) on the bus, fails fast while the circuit is open '''
+        if not probe and not await self.__async_circuit_closed():
+            _LOGGER.debug("circuit open, slave {} not read: {} - count: {}".format(self._addr, hex(start_reg), count))
+            return None, False
+        if not self._client.connected:
+            # link down: reconnected in the background, do not wait for it
+            self._bus.request_reconnect()
+            return None, False
+        async with self._bus.transaction(priority, self._session):
             rr = None
             if not self._client.connected:
-                raise ModbusConnexionError('Client Modbus not connected')
+                self._bus.request_reconnect()
+                return None, False
+            _deadline = self._bus.rtt.deadline(0x03, count, self._timeout)
+            _start = time.monotonic()
             try:
-                await asyncio.sleep(0.3)
                 _LOGGER.debug("reading holding registers: {} - count: {} - Slave: {}".format(hex(start_reg), count, self._addr))
-                rr = await self._client.read_holding_registers(address=start_reg, count=count, device_id=self._addr)
+                async with self._bus.pacer.async_frame():
+                    _start = time.monotonic()
+                    with self.__client_deadline(_deadline) as _kwargs:
+                        rr = await self._client.read_holding_registers(address=start_reg,
+                                                                        count=count,
+                                                                        device_id=self._addr,
+                                                                        **_kwargs)
+                    self._bus.rtt.record(0x03, count, time.monotonic() - _start)
+                self._breaker.success()
+                self.__replay_journal()
                 if rr.isError():
                     _LOGGER.error("reading holding registers error")
                     return None, False
             except Exception as e:
-                _LOGGER.error("{}".format(e))
+                if self.__timed_out(e, _start, _deadline):
+                    _LOGGER.error("reading holding registers timeout ({:.3f}s)".format(_deadline))
+                    # the configured timeout next time if the link slowed down
+                    self._bus.rtt.missed(0x03, count)
+                    self._bus.pacer.hold(_deadline)
+                else:
+                    _LOGGER.error("{}".format(e))
+                self._breaker.failure()
                 return None, False
 
             if isinstance(rr, ExceptionResponse):
@@ -120,44 +1467,178 @@ class Operations:
             elif not rr:
                 _LOGGER.error("Response Null")
                 return None, False
+            self._image.update(start_reg, rr.registers)
             return rr.registers, True
 
-    async def __async_write_register(self, reg:int, val:int) -> bool:
-        ''' Write one register (code 0x06) '''
-        async with Operations._lock:
+    async def __async_write_register(self,
+                                        reg:int,
+                                        val:int,
+                                        priority:int = const.PRIORITY_WRITE,
+                                        mask:int = const.REG_MASK_FULL,
+                                        ) -> bool:
+        ''' Write one register (code 0x06), only the last value of a burst is sent.
+            mask: bits changed, the others come from the shadow image '''
+        return await self._writes.async_write(reg, val, priority, mask)
+
+    async def __async_bus_write_register(self,
+                                            reg:int,
+                                            val:int,
+                                            priority:int = const.PRIORITY_WRITE,
+                                            mask:int = const.REG_MASK_FULL,
+                                            ) -> bool:
+        ''' Write one register (code 0x06) on the bus, fails fast while the circuit is open.
+            A write that does not reach the controller is journaled (mask bits) and replayed later '''
+        if not await self.__async_circuit_closed():
+            _LOGGER.error("circuit open, slave {} not written: {} - Val: {}".format(self._addr, hex(reg), hex(val)))
+            self._journal.record(reg, val, priority, mask)
+            return False
+        if not self._client.connected:
+            _LOGGER.error("link down, slave {} not written: {} - Val: {}".format(self._addr, hex(reg), hex(val)))
+            self._journal.record(reg, val, priority, mask)
+            self._bus.request_reconnect()
+            return False
+        async with self._bus.transaction(priority, self._session):
             rq = None
             ret = True
             if not self._client.connected:
-                raise ModbusConnexionError('Client Modbus not connected')
+                self._journal.record(reg, val, priority, mask)
+                self._bus.request_reconnect()
+                return False
+            _deadline = self._bus.rtt.deadline(0x06, 1, self._timeout)
+            _start = time.monotonic()
             try:
-                await asyncio.sleep(0.3)
                 _LOGGER.debug("writing single register: {} - Slave: {} - Val: {}".format(hex(reg), self._addr, hex(val)))
-                rq = await self._client.write_register(address=reg, value=val, device_id=self._addr)
+                async with self._bus.pacer.async_frame():
+                    _start = time.monotonic()
+                    with self.__client_deadline(_deadline) as _kwargs:
+                        rq = await self._client.write_register(address=reg,
+                                                                value=val,
+                                                                device_id=self._addr,
+                                                                **_kwargs)
+                    self._bus.rtt.record(0x06, 1, time.monotonic() - _start)
+                self._breaker.success()
+                # answered (even refused): the intent is settled
+                self._journal.discard(reg)
+                self.__replay_journal()
                 if rq.isError():
                     _LOGGER.error("writing register error")
                     return False
             except Exception as e:
-                _LOGGER.error("{}".format(e))
+                if self.__timed_out(e, _start, _deadline):
+                    _LOGGER.error("writing register timeout ({:.3f}s)".format(_deadline))
+                    self._bus.rtt.missed(0x06, 1)
+                    self._bus.pacer.hold(_deadline)
+                else:
+                    _LOGGER.error("{}".format(e))
+                self._breaker.failure()
+                self._journal.record(reg, val, priority, mask)
                 return False
 
             if isinstance(rq, ExceptionResponse):
-                _LOGGER.error("Received modbus exception ({})".format(rr))
+                _LOGGER.error("Received modbus exception ({})".format(rq))
                 return False
+            self._image.update(reg, [val])
+            self._written[reg] = val
             return ret 
 
+    def __replay_journal(self) -> None:
+        ''' The controller answers: replay the journaled writes in the background '''
+        if self._journal and self._replay_task is None:
+            self._replay_task = asyncio.get_running_loop().create_task(self.__async_replay_journal())
+
+    async def __async_replay_journal(self) -> None:
+        ''' Replay the journaled writes one at a time, stop at the first failure (kept for later).
+            Bit fields are merged into the register read again: the other bits may have
+            changed on the controller since the write was journaled '''
+        try:
+            for reg, val, priority, mask in self._journal.due():
+                if self._journal.get(reg) != val or self._journal.mask(reg) != mask \
+                    or self._writes.pending(reg) is not None:
+                    # written again since, the newer value wins
+                    continue
+                if mask != const.REG_MASK_FULL:
+                    fresh, ret = await self.__async_read_register(reg)
+                    if not ret:
+                        break
+                    if self._journal.get(reg) != val or self._writes.pending(reg) is not None:
+                        continue
+                    val = (fresh & ~mask) | (val & mask)
+                    if val == fresh:
+                        _LOGGER.debug("journaled write register {} already applied, dropped".format(hex(reg)))
+                        self._journal.discard(reg)
+                        continue
+                _LOGGER.info("replay write register: {} - Slave: {} - Val: {}".format(hex(reg), self._addr, hex(val)))
+                if not await self.__async_bus_write_register(reg, val, priority, mask):
+                    break
+        finally:
+            self._replay_task = None
+
+    async def __async_shadow_register(self, reg:int) -> (int, bool):
+        ''' Get register value from the shadow image, read it only if unknown or too old
+            a value waiting to be written takes precedence over the image '''
+        val = self._writes.pending(reg)
+        if val is not None:
+            return val, True
+        val = self._image.get(reg, self._shadow_max_age)
+        if val is not None:
+            return val, True
+        return await self.__async_read_register(reg)
+
     async def async_connect(self) -> None:
-        ''' connect to the modbus serial server '''
-        async with Operations._lock:
-            await self._client.connect()
+        ''' connect to the modbus serial server (shared connection) '''
+        if isinstance(self._client, PipelinedTcpClient):
+            # every new connection: does the gateway accept several transactions in flight ?
+            self._bus.add_listener(self._session, self.__link_changed)
+        await self._bus.async_attach(self._session)
+        if isinstance(self._client, PipelinedTcpClient):
+            # already connected by another slave: no link change reported
+            self.__link_changed(self.connected())
+            if self._probe_task is not None:
+                await asyncio.shield(self._probe_task)
+
+    def __link_changed(self, up:bool) -> None:
+        ''' link back (reconnected in the background): probe pipelining on the new connection '''
+        if up and not self._client.probed and self._probe_task is None:
+            self._probe_task = asyncio.get_running_loop().create_task(self.__async_probe())
+
+    async def __async_probe(self) -> None:
+        ''' probe pipelining support of the gateway '''
+        try:
+            await self._client.async_probe(self._addr)
+        finally:
+            self._probe_task = None
 
     def connected(self) -> bool:
         ''' get modbus client status '''
-        return self._client.connected
+        return self._bus.connected()
+
+    @property
+    def circuit(self) -> const.CircuitState:
+        ''' get circuit breaker state of the controller '''
+        return self._breaker.state
+
+    def add_link_listener(self, callback) -> None:
+        ''' call callback(up:bool) when the link goes down or comes back '''
+        self._bus.add_listener(self._session, callback)
+
+    @property
+    def image(self) -> RegisterImage:
+        ''' get shadow copy of the holding registers '''
+        return self._image
+
+    @property
+    def journal(self) -> WriteJournal:
+        ''' get writes waiting for the controller to answer again '''
+        return self._journal
+
+    def pop_written_registers(self) -> dict:
+        ''' get registers written since the last call ({reg: val}) '''
+        written, self._written = self._written, {}
+        return written
 
     def disconnect(self) -> None:
-        ''' close the underlying socket connection '''
-        if self._client.connected:
-            self._client.close()
+        ''' close the underlying socket connection, once no other slave ID uses it '''
+        self._bus.detach(self._session)
 
     async def async_discover_registered_areas(self) -> list:
         ''' Discover all areas registered to the system '''
@@ -166,27 +1647,9 @@ class Operations:
         if not ret:
             raise ReadRegistersError("Read holding regsiter error")
         zones_lst = []
-        zone_dict = {}
-        jdx = 1
-        flag = False
-        for idx, reg in enumerate(regs):
-            if idx % const.NUM_REG_PER_ZONE == 0:
-                zone_dict = {}
-                if const.ZoneRegister((reg >> 1) & 0b1) == const.ZoneRegister.REGISTER_ON:
-                    zone_dict['id'] = jdx
-                    zone_dict['state'] = const.ZoneState(reg & 0b01)
-                    zone_dict['register'] = const.ZoneRegister((reg >> 1) & 0b1)
-                    flag = True
-            elif idx % const.NUM_REG_PER_ZONE == 1 and flag:
-                zone_dict['fan'] = const.ZoneFanMode((reg & 0xF0) >> 4)
-                zone_dict['clim'] = const.ZoneClimMode(reg & 0x0F)
-            elif idx % const.NUM_REG_PER_ZONE == 2 and flag:
-                zone_dict['order_temp'] = reg/2
-            elif idx % const.NUM_REG_PER_ZONE == 3 and flag:
-                zone_dict['real_temp'] = reg/2
-                jdx += 1
-                flag = False
-                zones_lst.append(zone_dict)
+        for idx, zone_dict in decode_areas(regs).items():
+            zone_dict['id'] = idx
+            zones_lst.append(zone_dict)
         return zones_lst
 
     async def async_area_registered(self,
@@ -196,46 +1659,63 @@ class Operations:
         #_LOGGER.debug("Area : {}".format(zone_id))
         if zone_id > const.NB_ZONE_MAX or zone_id == 0:
             raise ZoneIdError('Zone Id must be between 1 to {}'.format(const.NB_ZONE_MAX))
-        zone_dict = {}
         regs, ret = await self.__async_read_registers(start_reg = const.REG_START_ZONE + (4 * (zone_id - 1)), 
                                                 count = const.NUM_REG_PER_ZONE)
         if not ret:
             raise ReadRegistersError("Error reading holding register")
-        if const.ZoneRegister((regs[0] >> 1) & 0b1) == const.ZoneRegister.REGISTER_OFF:
+        zone_dict = decode_area(*regs)
+        if zone_dict is None:
             _LOGGER.warning("Zone with id: {} is not registered".format(zone_id))
             return False, {}
-
-        zone_dict['state'] = const.ZoneState(regs[0] & 0b01)
-        zone_dict['register'] = const.ZoneRegister((regs[0] >> 1) & 0b1)
-        zone_dict['fan'] = const.ZoneFanMode((regs[1] & 0xF0) >> 4)
-        zone_dict['clim'] = const.ZoneClimMode(regs[1] & 0x0F)
-        zone_dict['order_temp'] = regs[2]/2
-        zone_dict['real_temp'] = regs[3]/2
         return True, zone_dict
 
     async def async_areas_registered(self) -> (bool, dict):
         """ Get all areas values """
-        _areas_dict:dict = {}
         # retreive all areas (registered and unregistered)
         regs, ret = await self.__async_read_registers(start_reg = const.REG_START_ZONE, 
-                                                count = const.NUM_REG_PER_ZONE * const.NB_ZONE_MAX)
+                                                count = const.NUM_REG_PER_ZONE * const.NB_ZONE_MAX,
+                                                priority = const.PRIORITY_POLL)
         if not ret:
             raise ReadRegistersError("Error reading holding register")
-        for area_idx in range(const.NB_ZONE_MAX):
-            _idx:int = 4 * area_idx
-            _area_dict:dict = {}
-            # test if area is registered or not
-            if const.ZoneRegister((regs[_idx + const.REG_LOCK_ZONE] >> 1) & 0b1) == const.ZoneRegister.REGISTER_OFF:
-                continue
+        return True, decode_areas(regs)
 
-            _area_dict['state'] = const.ZoneState(regs[_idx + const.REG_LOCK_ZONE] & 0b01)
-            _area_dict['register'] = const.ZoneRegister((regs[_idx + const.REG_LOCK_ZONE] >> 1) & 0b1)
-            _area_dict['fan'] = const.ZoneFanMode((regs[_idx + const.REG_STATE_AND_FLOW] & 0xF0) >> 4)
-            _area_dict['clim'] = const.ZoneClimMode(regs[_idx + const.REG_STATE_AND_FLOW] & 0x0F)
-            _area_dict['order_temp'] = regs[_idx + const.REG_TEMP_ORDER]/2
-            _area_dict['real_temp'] = regs[_idx + const.REG_TEMP_REAL]/2
-            _areas_dict[area_idx + 1] = _area_dict
-        return True, _areas_dict
+    async def async_read_registers_map(self,
+                                        regs,
+                                        priority:int = const.PRIORITY_REFRESH,
+                                        ) -> (bool, dict):
+        """ Read a set of holding registers with the fewest block reads
+            each span is a separate transaction so that a write can be served between two spans,
+            spans are requested together (in flight at once on a pipelined link) """
+        _vals:dict = {}
+        _spans = plan_read_spans(regs)
+        for attempt in range(const.SPAN_RETRIES + 1):
+            _reads = await asyncio.gather(*(self.__async_read_registers(start_reg = start, count = count, priority = priority)
+                                            for start, count in _spans))
+            _failed = []
+            for (start, count), (vals, _ret) in zip(_spans, _reads):
+                if not _ret:
+                    _failed.append((start, count))
+                    continue
+                for idx, val in enumerate(vals):
+                    _vals[start + idx] = val
+            # retry only the spans in error, unless the controller stopped answering
+            if not _failed or self._breaker.state != const.CircuitState.CLOSED:
+                break
+            _spans = _failed
+        for start, count in _failed:
+            _LOGGER.error("Error reading registers span: {} - count: {}".format(hex(start), count))
+        return not _failed, _vals
+
+    async def async_snapshot(self,
+                                priority:int = const.PRIORITY_POLL,
+                                ) -> (bool, RegisterSnapshot):
+        """ Read the whole register map (40001 -> 40082) in one request, snapshot of areas, engines and system """
+        ret, vals = await self.async_read_registers_map(range(const.REG_START_ZONE, const.NB_REG_TOTAL),
+                                                        priority = priority)
+        if not ret:
+            _LOGGER.error('Error reading registers map')
+            return False, None
+        return True, self._image.snapshot()
 
     async def async_set_debug(self, val:bool) -> bool:
         ''' Set/Reset Debug Mode '''
@@ -246,12 +1726,12 @@ class Operations:
         return True
 
     async def async_system_status(self) -> (bool, const.SysState):
-        ''' Read system status register '''
+        ''' Read system status register (None if unknown) '''
         reg, ret = await self.__async_read_register(const.REG_SYS_STATE)
         if not ret:
             _LOGGER.error('Error retreive system status')
             reg = 0
-        return ret, const.SysState(reg)
+        return ret, const.SYS_STATE_CODEC.decode(reg)[0]
 
     async def async_set_system_status(self,
                                         opt:const.SysState,
@@ -263,12 +1743,12 @@ class Operations:
         return ret
 
     async def async_global_mode(self) -> (bool, const.GlobalMode):
-        ''' Read global mode '''
+        ''' Read global mode (None if unknown) '''
         reg, ret = await self.__async_read_register(const.REG_GLOBAL_MODE)
         if not ret:
             _LOGGER.error('Error retreive global mode')
             reg = 1
-        return ret, const.GlobalMode(reg)
+        return ret, const.GLOBAL_MODE_CODEC.decode(reg)[0]
 
     async def async_set_global_mode(self,
                                     opt:const.GlobalMode,
@@ -280,12 +1760,12 @@ class Operations:
         return ret
 
     async def async_efficiency(self) -> (bool, const.Efficiency):
-        ''' read efficiency/speed '''
+        ''' read efficiency/speed (None if unknown) '''
         reg, ret = await self.__async_read_register(const.REG_EFFICIENCY)
         if not ret:
             _LOGGER.error('Error retreive efficiency')
             reg = 1
-        return ret, const.Efficiency(reg)
+        return ret, const.EFFICIENCY_CODEC.decode(reg)[0]
 
     async def async_set_efficiency(self,
                                     opt:const.GlobalMode,
@@ -303,7 +1783,7 @@ class Operations:
                                                         const.NUM_OF_ENGINES)
         if ret:
             for idx, reg in enumerate(regs):
-                engines_lst.append(const.FlowEngine(reg))
+                engines_lst.append(const.THROUGHPUT_CODEC.decode(reg)[0])
         else:
             _LOGGER.error('Error retreive engines throughput')
         return ret, engines_lst
@@ -311,26 +1791,26 @@ class Operations:
     async def async_engine_throughput(self,
                                         engine_id:int = 0,
                                         ) -> (bool, int):
-        ''' read engine throughput specified by id '''
+        ''' read engine throughput specified by id (None if out of range) '''
         if engine_id < 1 or engine_id > 4:
             raise UnitIdError("engine Id must be between 1 and 4")
         reg, ret = await self.__async_read_register(const.REG_START_FLOW_ENGINE + (engine_id - 1))
         if not ret:
             _LOGGER.error('Error retreive engine throughput for id:{}'.format(engine_id))
-            reg = 0
-        return ret, reg
+            return ret, 0
+        return ret, const.THROUGHPUT_CODEC.decode(reg)[0]
 
     async def async_engine_state(self,
                                     engine_id:int = 0,
                                     ) -> (bool, const.FlowEngine):
-        ''' read engine state specified by id '''
+        ''' read engine state specified by id (None if unknown) '''
         if engine_id < 1 or engine_id > 4:
             raise UnitIdError("Engine id must be between 1 and 4")
         reg, ret = await self.__async_read_register(const.REG_START_FLOW_STATE_ENGINE + (engine_id - 1))
         if not ret:
             _LOGGER.error('Error retreive engine state for id:{}'.format(engine_id))
             reg = 4
-        return ret, const.FlowEngine(reg)
+        return ret, const.FLOW_ENGINE_CODEC.decode(reg)[0]
 
     async def async_set_engine_state(self,
                                         engine_id:int = 0,
@@ -406,63 +1886,58 @@ class Operations:
     async def async_area_clim_and_fan_mode(self, 
                                             id_zone:int = 0,
                                             ) -> (bool, const.ZoneFanMode, const.ZoneClimMode):
-        """ get climate and fan mode of specific area id """
+        """ get climate and fan mode of specific area id (None if unknown) """
         reg, ret = await self.__async_read_register(reg = const.REG_START_ZONE + (4 * (id_zone - 1)) + const.REG_STATE_AND_FLOW)
         if not ret:
             _LOGGER.error('Error retreive area fan and climate values')
             reg = 0
-        return ret, const.ZoneFanMode((reg & 0xF0) >> 4), const.ZoneClimMode(reg & 0x0F)
+        return (ret, *const.ZONE_STATE_AND_FLOW_CODEC.decode(reg))
 
     async def async_area_state_and_register(self,
                                             id_zone:int = 0,
                                             ) -> (bool, const.ZoneRegister, const.ZoneState):
-        """ get area state and register """
+        """ get area state and register (None if unknown) """
         reg, ret = await self.__async_read_register(reg = const.REG_START_ZONE + (4 * (id_zone - 1)) + const.REG_LOCK_ZONE)
         if not ret:
             _LOGGER.error('Error retreive area register value')
             reg = 0
-        return ret, const.ZoneRegister((reg >> 1) & 0b1), const.ZoneState(reg & 0b01)
+        _state, _register = const.ZONE_LOCK_CODEC.decode(reg)
+        return ret, _register, _state
 
     async def async_set_area_state(self,
                                     id_zone:int = 0,
                                     val:const.ZoneState = const.ZoneState.STATE_OFF,
                                     ) -> bool:
         """ set area state """
-        register:const.ZoneRegister = const.ZoneRegister.REGISTER_OFF
         if id_zone > const.NB_ZONE_MAX or id_zone == 0:
             raise ZoneIdError('Area Id must be between 1 to 16')
-        # retreive values to combine the new state with register read
-        ret, register, _ = await self.async_area_state_and_register(id_zone = id_zone)
+        _reg = const.REG_START_ZONE + (4 * (id_zone - 1)) + const.REG_LOCK_ZONE
+        # combine the new state with the register bit from the shadow image
+        reg, ret = await self.__async_shadow_register(_reg)
         if not ret:
             _LOGGER.error("Error reading state and register mode")
             return ret
-        #_LOGGER.debug("register & state: {}".format(hex((int(register) << 1) | (int(val) & 0b01))))
-        ret = await self.__async_write_register(reg = const.REG_START_ZONE + (4 * (id_zone - 1)) + const.REG_LOCK_ZONE,
-                                            val = int(int(register) << 1) | (int(val) & 0b01))
+        ret = await self.__async_write_register(reg = _reg, val = (reg & ~0b01) | (int(val) & 0b01), mask = 0b01)
         if not ret:
             _LOGGER.error('Error writing area state value')
-
-        return True
+        return ret
 
     async def async_set_area_clim_mode(self,
                                         id_zone:int = 0,
                                         val:const.ZoneClimMode = const.ZoneClimMode.OFF,
                                 ) -> bool:
         """ set area clim mode """
-        fan:const.ZoneFanMode = const.ZoneFanMode.FAN_OFF
         if id_zone > const.NB_ZONE_MAX or id_zone == 0:
             raise ZoneIdError('Zone Id must be between 1 to 16')
-        # retreive values to combine the new climate mode with fan mode read
-        ret, fan, _ = await self.async_area_clim_and_fan_mode(id_zone = id_zone)
+        _reg = const.REG_START_ZONE + (4 * (id_zone - 1)) + const.REG_STATE_AND_FLOW
+        # combine the new climate mode with fan mode from the shadow image
+        reg, ret = await self.__async_shadow_register(_reg)
         if not ret:
             _LOGGER.error("Error reading fan and clim mode")
             return ret
-        #_LOGGER.debug("Fan & Clim: {}".format(hex((int(fan) << 4) | (int(val) & 0x0F))))
-        ret = await self.__async_write_register(reg = const.REG_START_ZONE + (4 * (id_zone - 1)) + const.REG_STATE_AND_FLOW,
-                                            val = int(int(fan) << 4) | (int(val) & 0x0F))
+        ret = await self.__async_write_register(reg = _reg, val = (reg & ~0x0F) | (int(val) & 0x0F), mask = 0x0F)
         if not ret:
             _LOGGER.error('Error writing area climate mode')
-
         return ret
 
     async def async_set_area_fan_mode(self,
@@ -470,17 +1945,15 @@ class Operations:
                                         val:const.ZoneFanMode = const.ZoneFanMode.FAN_OFF,
                                     ) -> bool:
         """ set area fan mode """
-        clim:const.ZoneClimMode = const.ZoneClimMode.OFF
         if id_zone > const.NB_ZONE_MAX or id_zone == 0:
             raise ZoneIdError('Zone Id must be between 1 to 16')
-        # retreive values to combine the new fan mode with climate mode read
-        ret, _, clim = await self.async_area_clim_and_fan_mode(id_zone = id_zone)
+        _reg = const.REG_START_ZONE + (4 * (id_zone - 1)) + const.REG_STATE_AND_FLOW
+        # combine the new fan mode with climate mode from the shadow image
+        reg, ret = await self.__async_shadow_register(_reg)
         if not ret:
             _LOGGER.error("Error reading fan and clim mode")
             return ret
-        #_LOGGER.debug("Fan & Clim: {}".format(hex((int(val) << 4) | (int(clim) & 0x0F))))
-        ret = await self.__async_write_register(reg = const.REG_START_ZONE + (4 * (id_zone - 1)) + const.REG_STATE_AND_FLOW,
-                                            val = int(int(val) << 4) | (int(clim) & 0x0F))
+        ret = await self.__async_write_register(reg = _reg, val = (reg & ~0xF0) | ((int(val) << 4) & 0xF0), mask = 0xF0)
         if not ret:
             _LOGGER.error('Error writing area fan mode')
         return ret
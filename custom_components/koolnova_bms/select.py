@@ -24,7 +24,7 @@ from .const import (
     ENGINE_FLOW_TRANSLATION,
 )
 
-from .coordinator import KoolnovaCoordinator
+from .coordinator import KoolnovaCoordinator, KoolnovaEntity
 
 from .koolnova.device import (
     Koolnova, 
@@ -35,6 +35,8 @@ from .koolnova.const import (
     GlobalMode,
     Efficiency,
     FlowEngine,
+    OWNER_ENGINE,
+    OWNER_SYSTEM,
 )
 
 _LOGGER = logging.getLogger(__name__)
@@ -45,8 +47,8 @@ async def async_setup_entry(hass: HomeAssistant,
                             ):
     """ Setup select entries """
 
-    device = hass.data[DOMAIN]["device"]
-    coordinator = hass.data[DOMAIN]["coordinator"]
+    device = hass.data[DOMAIN][entry.entry_id]["device"]
+    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
 
     entities = [
         GlobalModeSelect(coordinator, device),
@@ -57,7 +59,7 @@ async def async_setup_entry(hass: HomeAssistant,
         entities.append(EngineStateSelect(coordinator, device, engine))
     async_add_entities(entities)
 
-class GlobalModeSelect(CoordinatorEntity, SelectEntity):
+class GlobalModeSelect(KoolnovaEntity, SelectEntity):
     """ Select component to set global HVAC mode """
 
     _attr_entity_category: EntityCategory = EntityCategory.CONFIG
@@ -66,9 +68,9 @@ class GlobalModeSelect(CoordinatorEntity, SelectEntity):
                     coordinator: KoolnovaCoordinator, # pylint: disable=unused-argument
                     device: Koolnova, # pylint: disable=unused-argument,
                 ) -> None:
-        super().__init__(coordinator)
+        # notified only when the system registers change
+        super().__init__(coordinator, device, (OWNER_SYSTEM, 0))
         self._attr_options = GLOBAL_MODES
-        self._device = device
         self._attr_name = f"{self._device.name} global HVAC mode"
         self._attr_device_info = device.device_info
         self._attr_icon = "mdi:cog-clockwise"
@@ -90,19 +92,21 @@ class GlobalModeSelect(CoordinatorEntity, SelectEntity):
                 break
         await self._device.async_set_global_mode(GlobalMode(opt))
         self.__select_option(option)
-        await self.coordinator.async_request_refresh()
+        await self.coordinator.async_commit()
 
-    @callback
-    def _handle_coordinator_update(self) -> None:
+    def _state(self) -> tuple:
+        """ values shown by the entity """
+        return (self._attr_current_option,)
+
+    def _update_from_data(self, data:dict) -> None:
         """ Handle updated data from the coordinator 
             Retrieve latest state of global mode """
-        _LOGGER.debug("[UPDATE] Global Mode: {}".format(self.coordinator.data['glob']))
+        _LOGGER.debug("[UPDATE] Global Mode: {}".format(data['glob']))
         self.__select_option(
-            GLOBAL_MODE_TRANSLATION[int(self.coordinator.data['glob'])]
+            GLOBAL_MODE_TRANSLATION[int(data['glob'])]
         )
-        self.async_write_ha_state()
 
-class EfficiencySelect(CoordinatorEntity, SelectEntity):
+class EfficiencySelect(KoolnovaEntity, SelectEntity):
     """Select component to set global efficiency """
 
     _attr_entity_category: EntityCategory = EntityCategory.CONFIG
@@ -111,9 +115,9 @@ class EfficiencySelect(CoordinatorEntity, SelectEntity):
                     coordinator: KoolnovaCoordinator, # pylint: disable=unused-argument
                     device: Koolnova, # pylint: disable=unused-argument,
                 ) -> None:
-        super().__init__(coordinator)
+        # notified only when the system registers change
+        super().__init__(coordinator, device, (OWNER_SYSTEM, 0))
         self._attr_options = EFF_MODES
-        self._device = device
         self._attr_name = f"{self._device.name} global HVAC efficiency"
         self._attr_device_info = self._device.device_info
         self._attr_icon = "mdi:wind-power-outline"
@@ -140,19 +144,21 @@ class EfficiencySelect(CoordinatorEntity, SelectEntity):
                 break
         await self._device.async_set_efficiency(Efficiency(opt))
         self.__select_option(option)
-        await self.coordinator.async_request_refresh()
+        await self.coordinator.async_commit()
+
+    def _state(self) -> tuple:
+        """ values shown by the entity """
+        return (self._attr_current_option,)
 
-    @callback
-    def _handle_coordinator_update(self) -> None:
+    def _update_from_data(self, data:dict) -> None:
         """ Handle updated data from the coordinator
             Retrieve latest state of global efficiency """
-        _LOGGER.debug("[UPDATE] Efficiency: {}".format(self.coordinator.data['eff']))
+        _LOGGER.debug("[UPDATE] Efficiency: {}".format(data['eff']))
         self.__select_option(
-            EFF_TRANSLATION[int(self.coordinator.data['eff'])]
+            EFF_TRANSLATION[int(data['eff'])]
         )
-        self.async_write_ha_state()
 
-class EngineStateSelect(CoordinatorEntity, SelectEntity):
+class EngineStateSelect(KoolnovaEntity, SelectEntity):
     """Select component to set flow engine """
 
     _attr_entity_category: EntityCategory = EntityCategory.CONFIG
@@ -162,9 +168,9 @@ class EngineStateSelect(CoordinatorEntity, SelectEntity):
                     device: Koolnova, # pylint: disable=unused-argument,
                     engine: Engine, # pylint: disable=unused-argument
                 ) -> None:
-        super().__init__(coordinator)
+        # notified only when the engine registers change
+        super().__init__(coordinator, device, (OWNER_ENGINE, engine.engine_id))
         self._attr_options = ENGINE_FLOW_MODES
-        self._device = device
         self._engine = engine
         self._attr_name = f"{self._device.name} engine AC{self._engine.engine_id} state"
         self._attr_device_info = self._device.device_info
@@ -192,17 +198,18 @@ class EngineStateSelect(CoordinatorEntity, SelectEntity):
                 break
         await self._device.async_set_engine_state(FlowEngine(opt), self._engine.engine_id)
         self.__select_option(option)
-        await self.coordinator.async_request_refresh()
+        await self.coordinator.async_commit()
 
-    @callback
-    def _handle_coordinator_update(self) -> None:
+    def _state(self) -> tuple:
+        """ values shown by the entity """
+        return (self._attr_current_option,)
+
+    def _update_from_data(self, data:dict) -> None:
         """ Handle updated data from the coordinator
             Retrieve latest state of global efficiency """
-        for _cur_engine in self.coordinator.data['engines']:
-            if self._engine.engine_id == _cur_engine.engine_id:
-                _LOGGER.debug("[UPDATE] [ENGINE AC{}] Order temp: {}".format(_cur_engine.engine_id, _cur_engine.state))
-                self.__select_option(
-                    ENGINE_FLOW_TRANSLATION[int(_cur_engine.state)]
-                )
-                break
-        self.async_write_ha_state()
\ No newline at end of file
+        _cur_engine = data['engines_by_id'].get(self._engine.engine_id)
+        if _cur_engine is not None:
+            _LOGGER.debug("[UPDATE] [ENGINE AC{}] Order temp: {}".format(_cur_engine.engine_id, _cur_engine.state))
+            self.__select_option(
+                ENGINE_FLOW_TRANSLATION[int(_cur_engine.state)]
+            )
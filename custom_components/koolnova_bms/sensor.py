@@ -28,15 +28,17 @@ from homeassistant.const import (
 )
 
 from .const import (
-    DOMAIN
+    DOMAIN,
+    POLL_GROUP_NAMES,
 )
 
-from .coordinator import KoolnovaCoordinator
+from .coordinator import KoolnovaCoordinator, KoolnovaEntity
 
 from .koolnova.device import (
     Koolnova, 
     Engine,
 )
+from .koolnova.const import OWNER_ENGINE
 
 _LOGGER = logging.getLogger(__name__)
 MIN_TIME_BETWEEN_UPDATES = timedelta(seconds=30)
@@ -48,13 +50,13 @@ async def async_setup_entry(hass: HomeAssistant,
         ConfigEntry passée en argument
     """
     entities = []
-    device = hass.data[DOMAIN]["device"]
-    coordinator = hass.data[DOMAIN]["coordinator"]
+    device = hass.data[DOMAIN][entry.entry_id]["device"]
+    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
     if entry.data.get("Mode") == "Modbus RTU":
         entities.append(DiagnosticsSensor(device, "Device", entry.data))
         entities.append(DiagnosticsSensor(device, "Address", entry.data))
         entities.append(DiagModbusSensor(device, entry.data))
-    elif entry.data.get("Mode") == "Modbus TCP":
+    elif entry.data.get("Mode") in ("Modbus TCP", "Modbus RTU over TCP"):
         entities.append(DiagModbusSensor(device, entry.data))
     else:
         _LOGGER.error("Mode unknown")
@@ -62,6 +64,8 @@ async def async_setup_entry(hass: HomeAssistant,
     for engine in device.engines:
         entities.append(DiagEngineThroughputSensor(coordinator, device, engine))
         entities.append(DiagEngineTempOrderSensor(coordinator, device, engine))
+    for group in POLL_GROUP_NAMES:
+        entities.append(DiagFreshnessSensor(coordinator, device, group))
     async_add_entities(entities)
 
 class DiagnosticsSensor(SensorEntity):
@@ -117,6 +121,14 @@ class DiagModbusSensor(SensorEntity):
             self._attr_name = f"{self._device.name} {self._device.name} Modbus TCP"
             self._attr_native_value = "{}:{}".format(entry_infos.get("Address"),
                                                         entry_infos.get("Port"))
+        elif entry_infos.get("Mode") == 'Modbus RTU over TCP':
+            self._attr_name = f"{self._device.name} {self._device.name} Modbus RTU over TCP"
+            self._attr_native_value = "{}:{} {} {}{}{}".format(entry_infos.get("Address"),
+                                                                entry_infos.get("Port"),
+                                                                entry_infos.get("Baudrate"),
+                                                                entry_infos.get("Sizebyte"),
+                                                                entry_infos.get("Parity")[0],
+                                                                entry_infos.get("Stopbits"))
 
     @property
     def icon(self) -> str | None:
@@ -127,7 +139,7 @@ class DiagModbusSensor(SensorEntity):
         """ Do not poll for those entities """
         return False
 
-class DiagEngineThroughputSensor(CoordinatorEntity, SensorEntity):
+class DiagEngineThroughputSensor(KoolnovaEntity, SensorEntity):
     # pylint: disable = too-many-instance-attributes
     """ Representation of a Sensor """
 
@@ -139,8 +151,8 @@ class DiagEngineThroughputSensor(CoordinatorEntity, SensorEntity):
                     engine: Engine, # pylint: disable=unused-argument
                     ) -> None:
         """ Class constructor """
-        super().__init__(coordinator)
-        self._device = device
+        # notified only when the engine registers change
+        super().__init__(coordinator, device, (OWNER_ENGINE, engine.engine_id))
         self._engine = engine
         self._attr_name = f"{self._device.name} Engine AC{self._engine.engine_id} throughput"
         self._attr_entity_registry_enabled_default = True
@@ -152,16 +164,18 @@ class DiagEngineThroughputSensor(CoordinatorEntity, SensorEntity):
     def icon(self) -> str | None:
         return "mdi:thermostat-cog"
 
-    @callback
-    def _handle_coordinator_update(self) -> None:
+    def _state(self) -> tuple:
+        """ values shown by the entity """
+        return (self._attr_native_value,)
+
+    def _update_from_data(self, data:dict) -> None:
         """ Handle updated data from the coordinator """
-        for _cur_engine in self.coordinator.data['engines']:
-            if self._engine.engine_id == _cur_engine.engine_id:
-                _LOGGER.debug("[UPDATE] [ENGINE AC{}] Troughput: {}".format(_cur_engine.engine_id, _cur_engine.throughput))
-                self._attr_native_value = "{}".format(_cur_engine.throughput)
-        self.async_write_ha_state()
+        _cur_engine = data['engines_by_id'].get(self._engine.engine_id)
+        if _cur_engine is not None:
+            _LOGGER.debug("[UPDATE] [ENGINE AC{}] Troughput: {}".format(_cur_engine.engine_id, _cur_engine.throughput))
+            self._attr_native_value = "{}".format(_cur_engine.throughput)
 
-class DiagEngineTempOrderSensor(CoordinatorEntity, SensorEntity):
+class DiagEngineTempOrderSensor(KoolnovaEntity, SensorEntity):
     # pylint: disable = too-many-instance-attributes
     """ Representation of a Sensor """
 
@@ -174,8 +188,8 @@ class DiagEngineTempOrderSensor(CoordinatorEntity, SensorEntity):
                     engine: Engine, # pylint: disable=unused-argument
                     ) -> None:
         """ Class constructor """
-        super().__init__(coordinator)
-        self._device = device
+        # notified only when the engine registers change
+        super().__init__(coordinator, device, (OWNER_ENGINE, engine.engine_id))
         self._engine = engine
         self._attr_name = f"{self._device.name} Engine AC{self._engine.engine_id} temperature order"
         self._attr_entity_registry_enabled_default = True
@@ -187,11 +201,47 @@ class DiagEngineTempOrderSensor(CoordinatorEntity, SensorEntity):
     def icon(self) -> str | None:
         return "mdi:thermometer-lines"
 
-    @callback
-    def _handle_coordinator_update(self) -> None:
+    def _state(self) -> tuple:
+        """ values shown by the entity """
+        return (self._attr_native_value,)
+
+    def _update_from_data(self, data:dict) -> None:
+        """ Handle updated data from the coordinator """
+        _cur_engine = data['engines_by_id'].get(self._engine.engine_id)
+        if _cur_engine is not None:
+            _LOGGER.debug("[UPDATE] [ENGINE AC{}] Order temp: {}".format(_cur_engine.engine_id, _cur_engine.order_temp))
+            self._attr_native_value = "{}".format(_cur_engine.order_temp)
+
+class DiagFreshnessSensor(KoolnovaEntity, SensorEntity):
+    # pylint: disable = too-many-instance-attributes
+    """ Date of the last read of a registers group: how old the values shown are """
+
+    _attr_entity_category: EntityCategory | None = EntityCategory.DIAGNOSTIC
+    _attr_device_class: SensorDeviceClass = SensorDeviceClass.TIMESTAMP
+
+    def __init__(self,
+                    coordinator: KoolnovaCoordinator, # pylint: disable=unused-argument
+                    device: Koolnova, # pylint: disable=unused-argument
+                    group: str, # pylint: disable=unused-argument
+                    ) -> None:
+        """ Class constructor """
+        # notified at every poll, written only when the group was read
+        super().__init__(coordinator, device, None)
+        self._group = group
+        self._attr_name = f"{self._device.name} {POLL_GROUP_NAMES[group]} refreshed"
+        self._attr_entity_registry_enabled_default = True
+        self._attr_device_info = self._device.device_info
+        self._attr_unique_id = f"{DOMAIN}-{self._device.name}-{group}-freshness-sensor"
+        self._attr_native_value = self._device.freshness.get(group)
+
+    @property
+    def icon(self) -> str | None:
+        return "mdi:clock-check-outline"
+
+    def _state(self) -> tuple:
+        """ values shown by the entity """
+        return (self._attr_native_value,)
+
+    def _update_from_data(self, data:dict) -> None:
         """ Handle updated data from the coordinator """
-        for _cur_engine in self.coordinator.data['engines']:
-            if self._engine.engine_id == _cur_engine.engine_id:
-                _LOGGER.debug("[UPDATE] [ENGINE AC{}] Order temp: {}".format(_cur_engine.engine_id, _cur_engine.order_temp))
-                self._attr_native_value = "{}".format(_cur_engine.order_temp)
-        self.async_write_ha_state()
\ No newline at end of file
+        self._attr_native_value = data['freshness'].get(self._group)
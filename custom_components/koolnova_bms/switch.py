@@ -21,7 +21,7 @@ from .const import (
     DOMAIN
 )
 
-from .coordinator import KoolnovaCoordinator
+from .coordinator import KoolnovaCoordinator, KoolnovaEntity
 
 from homeassistant.const import (
     STATE_OFF,
@@ -31,6 +31,7 @@ from homeassistant.const import (
 from .koolnova.device import Koolnova
 from .koolnova.const import (
     SysState,
+    OWNER_SYSTEM,
 )
 
 _LOGGER = logging.getLogger(__name__)
@@ -41,8 +42,8 @@ async def async_setup_entry(hass: HomeAssistant,
                             ):
     """ Setup switch entries """
 
-    device = hass.data[DOMAIN]["device"]
-    coordinator = hass.data[DOMAIN]["coordinator"]
+    device = hass.data[DOMAIN][entry.entry_id]["device"]
+    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
 
     entities = [
         SystemStateSwitch(coordinator, device),
@@ -50,7 +51,7 @@ async def async_setup_entry(hass: HomeAssistant,
     ]
     async_add_entities(entities)
 
-class SystemStateSwitch(CoordinatorEntity, SwitchEntity):
+class SystemStateSwitch(KoolnovaEntity, SwitchEntity):
     """Select component to set system state """
     _attr_has_entity_name: bool = True
     _attr_device_class: SwitchDeviceClass = SwitchDeviceClass.SWITCH
@@ -60,8 +61,8 @@ class SystemStateSwitch(CoordinatorEntity, SwitchEntity):
                     coordinator: KoolnovaCoordinator, # pylint: disable=unused-argument
                     device: Koolnova, # pylint: disable=unused-argument
                 ) -> None:
-        super().__init__(coordinator)
-        self._device = device
+        # notified only when the system registers change
+        super().__init__(coordinator, device, (OWNER_SYSTEM, 0))
         self._attr_name = f"{self._device.name} Global HVAC State"
         self._attr_device_info = self._device.device_info
         self._attr_unique_id = f"{DOMAIN}-{self._device.name}-Global-HVAC-State-switch"
@@ -77,6 +78,8 @@ class SystemStateSwitch(CoordinatorEntity, SwitchEntity):
         await self._device.async_set_sys_state(SysState.SYS_STATE_ON)
         self._attr_is_on = True
         self._attr_state = STATE_ON
+        await self.coordinator.async_commit()
+        # back to full polling at once
         await self.coordinator.async_request_refresh()
 
     async def async_turn_off(self, **kwargs):
@@ -85,18 +88,20 @@ class SystemStateSwitch(CoordinatorEntity, SwitchEntity):
         await self._device.async_set_sys_state(SysState.SYS_STATE_OFF)
         self._attr_is_on = False
         self._attr_state = STATE_OFF
-        await self.coordinator.async_request_refresh()
+        await self.coordinator.async_commit()
+
+    def _state(self) -> tuple:
+        """ values shown by the entity """
+        return (self._attr_is_on,)
 
-    @callback
-    def _handle_coordinator_update(self) -> None:
+    def _update_from_data(self, data:dict) -> None:
         """ Handle updated data from the coordinator """
-        self._attr_is_on = bool(int(self.coordinator.data['sys']))
-        _LOGGER.debug("[UPDATE] Switch State: {}".format(bool(int(self.coordinator.data['sys']))))
-        if bool(int(self.coordinator.data['sys'])):
+        self._attr_is_on = bool(int(data['sys']))
+        _LOGGER.debug("[UPDATE] Switch State: {}".format(bool(int(data['sys']))))
+        if bool(int(data['sys'])):
             self._attr_state = STATE_ON
         else:
             self._attr_state = STATE_OFF
-        self.async_write_ha_state()
 
     @property
     def is_on(self) -> bool | None:
@@ -0,0 +1,6 @@
+""" Test configuration: the koolnova modbus package is imported on its own,
+    without the Home Assistant integration around it """
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "custom_components", "koolnova_bms"))
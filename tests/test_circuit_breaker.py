@@ -0,0 +1,99 @@
+""" Tests of the circuit breaker state transitions """
+from koolnova.const import CircuitState
+from koolnova.operations import CircuitBreaker
+
+
+def _breaker():
+    return CircuitBreaker("test", threshold=3, period=10, period_max=25)
+
+
+def _elapse(breaker, delay):
+    """ Move the opening time back instead of sleeping """
+    breaker._opened_at -= delay
+
+
+def _open(breaker):
+    for _ in range(3):
+        breaker.failure()
+
+
+def test_opens_at_threshold():
+    breaker = _breaker()
+    breaker.failure()
+    breaker.failure()
+    assert breaker.state == CircuitState.CLOSED
+    breaker.failure()
+    assert breaker.state == CircuitState.OPEN
+
+
+def test_success_resets_failure_count():
+    breaker = _breaker()
+    breaker.failure()
+    breaker.failure()
+    breaker.success()
+    breaker.failure()
+    breaker.failure()
+    assert breaker.state == CircuitState.CLOSED
+
+
+def test_probe_due_after_period():
+    breaker = _breaker()
+    _open(breaker)
+    assert not breaker.probe_due()
+    _elapse(breaker, 10)
+    assert breaker.probe_due()
+
+
+def test_probe_success_closes():
+    breaker = _breaker()
+    _open(breaker)
+    _elapse(breaker, 10)
+    breaker.half_open()
+    assert breaker.state == CircuitState.HALF_OPEN
+    assert not breaker.probe_due()
+    breaker.success()
+    assert breaker.state == CircuitState.CLOSED
+
+
+def test_probe_failure_doubles_period_up_to_max():
+    breaker = _breaker()
+    _open(breaker)
+    for period in (20, 25, 25):
+        _elapse(breaker, 25)
+        breaker.half_open()
+        breaker.failure()
+        assert breaker.state == CircuitState.OPEN
+        _elapse(breaker, period - 0.5)
+        assert not breaker.probe_due()
+        _elapse(breaker, 0.5)
+        assert breaker.probe_due()
+
+
+def test_success_restores_base_period():
+    breaker = _breaker()
+    _open(breaker)
+    _elapse(breaker, 10)
+    breaker.half_open()
+    breaker.failure()
+    _elapse(breaker, 20)
+    breaker.half_open()
+    breaker.success()
+    _open(breaker)
+    _elapse(breaker, 10)
+    assert breaker.probe_due()
+
+
+def test_aborted_probe_is_due_again_at_once():
+    breaker = _breaker()
+    _open(breaker)
+    _elapse(breaker, 10)
+    breaker.half_open()
+    breaker.abort_probe()
+    assert breaker.state == CircuitState.OPEN
+    assert breaker.probe_due()
+
+
+def test_abort_probe_leaves_closed_circuit_alone():
+    breaker = _breaker()
+    breaker.abort_probe()
+    assert breaker.state == CircuitState.CLOSED
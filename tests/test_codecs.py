@@ -0,0 +1,64 @@
+""" Tests of the register codecs """
+from koolnova import const
+from koolnova.operations import decode_area, decode_areas, register_owner
+
+
+def test_zone_codec_decodes_both_nibbles():
+    assert const.ZONE_STATE_AND_FLOW_CODEC.decode(0x32) == (const.ZoneFanMode.FAN_HIGH, const.ZoneClimMode.HEAT)
+
+
+def test_zone_codec_ignores_bits_outside_fields():
+    assert const.ZONE_LOCK_CODEC.decode(0x103) == (const.ZoneState.STATE_ON, const.ZoneRegister.REGISTER_ON)
+
+
+def test_unknown_value_decodes_to_none():
+    assert const.ZONE_STATE_AND_FLOW_CODEC.decode(0x53) == (None, None)
+    assert const.FLOW_ENGINE_CODEC.decode(0) == (None,)
+
+
+def test_strict_codec_rejects_values_above_mask():
+    assert const.EFFICIENCY_CODEC.decode(3) == (const.Efficiency.MED_EFF,)
+    assert const.EFFICIENCY_CODEC.decode(0x103) == (None,)
+
+
+def test_codec_matches_enum_constructor():
+    for raw in range(0x100):
+        fan = raw >> 4
+        clim = raw & 0x0F
+        expected = (const.ZoneFanMode(fan) if fan in {m.value for m in const.ZoneFanMode} else None,
+                    const.ZoneClimMode(clim) if clim in {m.value for m in const.ZoneClimMode} else None)
+        assert const.ZONE_STATE_AND_FLOW_CODEC.decode(raw) == expected
+
+
+def test_throughput_range():
+    assert const.THROUGHPUT_CODEC.decode(const.FLOW_ENGINE_VAL_MIN) == (const.FLOW_ENGINE_VAL_MIN,)
+    assert const.THROUGHPUT_CODEC.decode(const.FLOW_ENGINE_VAL_MAX) == (const.FLOW_ENGINE_VAL_MAX,)
+    assert const.THROUGHPUT_CODEC.decode(const.FLOW_ENGINE_VAL_MAX + 1) == (None,)
+
+
+def test_decode_registered_area():
+    area = decode_area(0b11, 0x12, 44, 41)
+    assert area == {'state': const.ZoneState.STATE_ON,
+                    'register': const.ZoneRegister.REGISTER_ON,
+                    'fan': const.ZoneFanMode.FAN_LOW,
+                    'clim': const.ZoneClimMode.HEAT,
+                    'order_temp': 22.0,
+                    'real_temp': 20.5}
+
+
+def test_decode_area_not_registered_or_unknown():
+    assert decode_area(0b01, 0x12, 44, 41) is None
+    assert decode_area(0b11, 0x17, 44, 41) is None
+
+
+def test_decode_areas_keeps_registered_zones():
+    regs = [0] * const.NUM_REG_PER_ZONE * const.NB_ZONE_MAX
+    regs[const.NUM_REG_PER_ZONE * 2:const.NUM_REG_PER_ZONE * 3] = [0b10, 0x11, 40, 42]
+    assert list(decode_areas(regs)) == [3]
+
+
+def test_register_owner():
+    assert register_owner(const.REG_START_ZONE) == (const.OWNER_ZONE, 1)
+    assert register_owner(const.REG_START_ZONE + const.NUM_REG_PER_ZONE) == (const.OWNER_ZONE, 2)
+    assert register_owner(const.REG_START_FLOW_STATE_ENGINE + 1) == (const.OWNER_ENGINE, 2)
+    assert register_owner(const.REG_SYS_STATE) == (const.OWNER_SYSTEM, 0)
@@ -0,0 +1,79 @@
+""" Tests of the Modbus connection shared between slave IDs """
+import asyncio
+
+from koolnova.operations import FramePacer, ModbusBus
+
+
+class FakeClient:
+    """ pymodbus client reduced to its connection state """
+
+    def __init__(self):
+        self.connected = False
+        self.connects = 0
+        self.closes = 0
+
+    async def connect(self):
+        self.connects += 1
+        self.connected = True
+        return True
+
+    def close(self):
+        self.closes += 1
+        self.connected = False
+
+
+def _bus(key):
+    return ModbusBus.get(key, FramePacer("tcp"), FakeClient)
+
+
+def test_same_endpoint_shares_one_bus():
+    assert ModbusBus.tcp_key("10.0.0.1", 502) == "tcp:10.0.0.1:502"
+    bus = _bus("tcp:10.0.0.1:502")
+    assert _bus("tcp:10.0.0.1:502") is bus
+    assert _bus("tcp:10.0.0.2:502") is not bus
+
+
+def test_connection_opened_once_closed_with_last_session():
+    async def run():
+        bus = _bus("tcp:10.0.0.3:502")
+        first, second = bus.open_session(), bus.open_session()
+        await bus.async_attach(first)
+        await bus.async_attach(second)
+        assert bus.client.connects == 1
+        assert bus.sessions == 2
+        bus.detach(first)
+        assert bus.connected()
+        bus.detach(second)
+        assert bus.client.closes == 1
+        assert _bus("tcp:10.0.0.3:502") is not bus
+    asyncio.run(run())
+
+
+def test_link_listeners_called_once_per_change():
+    async def run():
+        bus = _bus("tcp:10.0.0.4:502")
+        session = bus.open_session()
+        changes = []
+        bus.add_listener(session, changes.append)
+        bus.add_listener(session, changes.append)
+        await bus.async_attach(session)
+        await bus.async_attach(session)
+        assert changes == [True]
+        assert bus.link_up
+        bus.detach(session)
+    asyncio.run(run())
+
+
+def test_detached_session_no_longer_notified():
+    async def run():
+        bus = _bus("tcp:10.0.0.5:502")
+        first, second = bus.open_session(), bus.open_session()
+        changes = []
+        bus.add_listener(first, changes.append)
+        await bus.async_attach(first)
+        await bus.async_attach(second)
+        bus.detach(first)
+        bus._set_link(False)
+        assert changes == [True]
+        bus.detach(second)
+    asyncio.run(run())
@@ -0,0 +1,112 @@
+""" Tests of the pipelined Modbus TCP client against a local gateway """
+import asyncio
+import struct
+
+import pytest
+
+from koolnova.operations import PipelinedTcpClient
+
+
+class FakeGateway:
+    """ Modbus TCP gateway answering each read with the register address,
+        replies optionally held by batch and sent back reversed """
+
+    def __init__(self, batch=1, reverse=False, garbage=False):
+        self.batch = batch
+        self.reverse = reverse
+        self.garbage = garbage
+        self.connections = 0
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        held = []
+        try:
+            while True:
+                tid, _, length, unit = struct.unpack(">HHHB", await reader.readexactly(7))
+                pdu = await reader.readexactly(length - 1)
+                if self.garbage:
+                    writer.write(struct.pack(">HHHB", tid, 1, 3, unit))
+                    await writer.drain()
+                    continue
+                address = struct.unpack(">H", pdu[1:3])[0]
+                reply = struct.pack(">BBH", 0x03, 2, address)
+                held.append(struct.pack(">HHHB", tid, 0, len(reply) + 1, unit) + reply)
+                if len(held) == self.batch:
+                    for frame in reversed(held) if self.reverse else held:
+                        writer.write(frame)
+                    held = []
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            writer.close()
+
+
+def _run(gateway, scenario):
+    async def run():
+        port = await gateway.start()
+        client = PipelinedTcpClient("127.0.0.1", port, depth=2, timeout=0.5)
+        try:
+            assert await client.connect()
+            await scenario(client)
+        finally:
+            client.close()
+            await gateway.stop()
+    asyncio.run(run())
+
+
+def test_replies_matched_by_transaction_id():
+    async def scenario(client):
+        assert await client.async_probe(1)
+        assert client.depth == 2
+        rets = await asyncio.gather(*(client.read_holding_registers(reg) for reg in range(4)))
+        assert [rr.registers for rr in rets] == [[reg] for reg in range(4)]
+    _run(FakeGateway(batch=2), scenario)
+
+
+def test_reordering_gateway_falls_back_to_one_transaction():
+    async def scenario(client):
+        assert not await client.async_probe(1)
+        assert client.probed
+        assert client.depth == 1
+        gateway.batch = 1
+        assert (await client.read_holding_registers(7)).registers == [7]
+    gateway = FakeGateway(batch=2, reverse=True)
+    _run(gateway, scenario)
+
+
+def test_malformed_header_closes_connection():
+    async def scenario(client):
+        with pytest.raises(ConnectionError):
+            await client.read_holding_registers(7)
+        assert not client.connected
+    _run(FakeGateway(garbage=True), scenario)
+
+
+def test_reconnection_probes_again():
+    async def scenario(client):
+        assert await client.async_probe(1)
+        client.close()
+        assert await client.connect()
+        assert not client.probed
+        assert client.depth == 1
+        assert await client.async_probe(1)
+    _run(FakeGateway(batch=2), scenario)
+
+
+def test_cancelled_transaction_reply_is_dropped():
+    async def scenario(client):
+        task = asyncio.create_task(client.read_holding_registers(3))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        # gateway holds the first reply until a second request comes
+        assert (await client.read_holding_registers(4)).registers == [4]
+        assert client.connected
+    _run(FakeGateway(batch=2), scenario)
@@ -0,0 +1,61 @@
+""" Tests of the bus transaction queue """
+import asyncio
+
+from koolnova import const
+from koolnova.operations import PriorityLock
+
+
+async def _serve(lock, requests):
+    """ Queue the requests [(name, priority, rank)] behind a held lock, get the grant order """
+    order = []
+
+    async def transaction(name, priority, rank):
+        async with lock.async_hold(priority, rank):
+            order.append(name)
+
+    await lock.acquire()
+    tasks = [asyncio.create_task(transaction(*request)) for request in requests]
+    await asyncio.sleep(0)
+    lock.release()
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_writes_pass_before_refreshes_and_polls():
+    order = asyncio.run(_serve(PriorityLock(), [("poll", const.PRIORITY_POLL, 0),
+                                                ("refresh", const.PRIORITY_REFRESH, 0),
+                                                ("write", const.PRIORITY_WRITE, 0)]))
+    assert order == ["write", "refresh", "poll"]
+
+
+def test_rank_then_arrival_within_a_priority():
+    order = asyncio.run(_serve(PriorityLock(), [("late", const.PRIORITY_POLL, 2),
+                                                ("first", const.PRIORITY_POLL, 1),
+                                                ("second", const.PRIORITY_POLL, 1)]))
+    assert order == ["first", "second", "late"]
+
+
+def test_capacity_lets_several_transactions_in():
+    async def run():
+        lock = PriorityLock(lambda: 2)
+        await lock.acquire()
+        await lock.acquire()
+        assert lock.locked()
+        lock.release()
+        assert not lock.locked()
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_does_not_keep_the_lock():
+    async def run():
+        lock = PriorityLock()
+        await lock.acquire()
+        waiter = asyncio.create_task(lock.acquire(const.PRIORITY_WRITE))
+        await asyncio.sleep(0)
+        # handed over then cancelled before the waiter runs
+        lock.release()
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert not lock.locked()
+        await asyncio.wait_for(lock.acquire(), 1)
+    asyncio.run(run())
@@ -0,0 +1,74 @@
+""" Tests of the single-flight read coalescer """
+import asyncio
+
+from koolnova import const
+from koolnova.operations import ReadCoalescer
+
+
+class FakeBus:
+    """ Registers map read span by span, holding each read for a while """
+
+    def __init__(self, delay=0.01, fail=False):
+        self.reads = []
+        self.delay = delay
+        self.fail = fail
+
+    async def read(self, start, count, priority):
+        self.reads.append((start, count, priority))
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            return None, False
+        return [100 + reg for reg in range(start, start + count)], True
+
+
+def test_reads_within_the_window_share_one_request():
+    async def run():
+        bus = FakeBus()
+        reads = ReadCoalescer(bus.read, window=0.01)
+        rets = await asyncio.gather(reads.async_read(0, 2), reads.async_read(1, 2), reads.async_read(2, 1))
+        assert rets == [([100, 101], True), ([101, 102], True), ([102], True)]
+        assert bus.reads == [(0, 3, const.PRIORITY_REFRESH)]
+    asyncio.run(run())
+
+
+def test_read_covered_by_a_span_in_flight_is_not_sent_again():
+    async def run():
+        bus = FakeBus(delay=0.05)
+        reads = ReadCoalescer(bus.read, window=0)
+        first = asyncio.create_task(reads.async_read(0, 4))
+        await asyncio.sleep(0.02)
+        assert await reads.async_read(1, 2) == ([101, 102], True)
+        await first
+        assert bus.reads == [(0, 4, const.PRIORITY_REFRESH)]
+    asyncio.run(run())
+
+
+def test_batch_keeps_the_most_urgent_priority():
+    async def run():
+        bus = FakeBus()
+        reads = ReadCoalescer(bus.read, window=0.01)
+        await asyncio.gather(reads.async_read(0, 1, const.PRIORITY_POLL),
+                                reads.async_read(1, 1, const.PRIORITY_WRITE))
+        assert bus.reads == [(0, 2, const.PRIORITY_WRITE)]
+    asyncio.run(run())
+
+
+def test_failed_read_fails_every_reader():
+    async def run():
+        bus = FakeBus(fail=True)
+        reads = ReadCoalescer(bus.read, window=0.01)
+        assert await asyncio.gather(reads.async_read(0, 1), reads.async_read(1, 1)) == [(None, False),
+                                                                                        (None, False)]
+    asyncio.run(run())
+
+
+def test_cancelled_reader_does_not_cancel_the_shared_read():
+    async def run():
+        bus = FakeBus(delay=0.05)
+        reads = ReadCoalescer(bus.read, window=0)
+        first = asyncio.create_task(reads.async_read(0, 2))
+        second = asyncio.create_task(reads.async_read(0, 2))
+        await asyncio.sleep(0.02)
+        first.cancel()
+        assert await second == ([100, 101], True)
+    asyncio.run(run())
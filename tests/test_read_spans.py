@@ -0,0 +1,34 @@
+""" Tests of the block-read planner """
+from koolnova import const
+from koolnova.operations import plan_read_spans
+
+
+def test_contiguous_registers_make_one_span():
+    assert plan_read_spans([3, 1, 2, 0]) == [(0, 4)]
+
+
+def test_duplicates_are_read_once():
+    assert plan_read_spans([5, 5, 6]) == [(5, 2)]
+
+
+def test_small_gap_is_read_through():
+    assert plan_read_spans([0, 10], max_gap=16) == [(0, 11)]
+
+
+def test_large_gap_splits_spans():
+    assert plan_read_spans([0, 20], max_gap=16) == [(0, 1), (20, 1)]
+
+
+def test_span_never_exceeds_max_count():
+    spans = plan_read_spans(range(0, 10), max_gap=16, max_count=4)
+    assert spans == [(0, 4), (4, 4), (8, 2)]
+    assert all(count <= 4 for _, count in spans)
+
+
+def test_whole_map_fits_one_request():
+    assert plan_read_spans(range(const.REG_START_ZONE, const.REG_SYS_STATE + 1)) == \
+        [(const.REG_START_ZONE, const.REG_SYS_STATE + 1 - const.REG_START_ZONE)]
+
+
+def test_no_register_no_span():
+    assert plan_read_spans([]) == []
@@ -0,0 +1,66 @@
+""" Tests of the write coalescer """
+import asyncio
+
+from koolnova import const
+from koolnova.operations import WriteCoalescer
+
+
+class FakeBus:
+    """ Records the writes sent on the bus """
+
+    def __init__(self, ret=True):
+        self.writes = []
+        self.ret = ret
+
+    async def write(self, reg, val, priority, mask):
+        self.writes.append((reg, val, priority, mask))
+        return self.ret
+
+
+def test_only_the_last_value_of_a_burst_is_sent():
+    async def run():
+        bus = FakeBus()
+        writes = WriteCoalescer(bus.write, window=0.01)
+        rets = await asyncio.gather(*(writes.async_write(2, val) for val in (40, 42, 44)))
+        assert rets == [True, True, True]
+        assert bus.writes == [(2, 44, const.PRIORITY_WRITE, const.REG_MASK_FULL)]
+    asyncio.run(run())
+
+
+def test_registers_are_written_separately():
+    async def run():
+        bus = FakeBus()
+        writes = WriteCoalescer(bus.write, window=0.01)
+        await asyncio.gather(writes.async_write(2, 40), writes.async_write(6, 41))
+        assert sorted(bus.writes) == [(2, 40, const.PRIORITY_WRITE, const.REG_MASK_FULL),
+                                        (6, 41, const.PRIORITY_WRITE, const.REG_MASK_FULL)]
+    asyncio.run(run())
+
+
+def test_masks_of_a_burst_are_merged():
+    async def run():
+        bus = FakeBus()
+        writes = WriteCoalescer(bus.write, window=0.01)
+        await asyncio.gather(writes.async_write(1, 0x12, mask=0x0F), writes.async_write(1, 0x32, mask=0xF0))
+        assert bus.writes == [(1, 0x32, const.PRIORITY_WRITE, 0xFF)]
+    asyncio.run(run())
+
+
+def test_pending_value_is_visible_until_sent():
+    async def run():
+        bus = FakeBus()
+        writes = WriteCoalescer(bus.write, window=0.01)
+        task = asyncio.create_task(writes.async_write(2, 40))
+        await asyncio.sleep(0)
+        assert writes.pending(2) == 40
+        await task
+        assert writes.pending(2) is None
+    asyncio.run(run())
+
+
+def test_refused_write_is_reported_to_every_writer():
+    async def run():
+        bus = FakeBus(ret=False)
+        writes = WriteCoalescer(bus.write, window=0.01)
+        assert await asyncio.gather(writes.async_write(2, 40), writes.async_write(2, 42)) == [False, False]
+    asyncio.run(run())
@@ -0,0 +1,108 @@
+""" Tests of the write journal """
+from koolnova import const
+from koolnova.operations import WriteJournal
+
+
+def _age(journal, reg, delay):
+    """ Move the intent time back instead of sleeping """
+    journal._entries[reg][2] -= delay
+
+
+def test_partial_writes_merge_their_bits():
+    journal = WriteJournal()
+    journal.record(1, 0x03, mask=0x0F)
+    journal.record(1, 0x20, mask=0xF0)
+    assert journal.get(1) == 0x23
+    assert journal.mask(1) == 0xFF
+
+
+def test_later_write_wins_on_the_same_bits():
+    journal = WriteJournal()
+    journal.record(1, 0x13, mask=0xFF)
+    journal.record(1, 0x05, mask=0x0F)
+    assert journal.get(1) == 0x15
+    assert journal.mask(1) == 0xFF
+
+
+def test_unknown_register_has_no_bits():
+    journal = WriteJournal()
+    assert journal.get(1) is None
+    assert journal.mask(1) == 0
+
+
+def test_same_intent_keeps_its_age():
+    journal = WriteJournal()
+    journal.record(2, 40)
+    _age(journal, 2, 100)
+    stamp = journal._entries[2][2]
+    journal.record(2, 40)
+    assert journal._entries[2][2] == stamp
+    journal.record(2, 42)
+    assert journal._entries[2][2] > stamp
+
+
+def test_widened_mask_is_a_new_intent():
+    journal = WriteJournal()
+    journal.record(1, 0x03, mask=0x0F)
+    _age(journal, 1, 100)
+    stamp = journal._entries[1][2]
+    journal.record(1, 0x03, mask=0xFF)
+    assert journal._entries[1][2] > stamp
+
+
+def test_priority_keeps_the_most_urgent():
+    journal = WriteJournal()
+    journal.record(2, 40, priority=const.PRIORITY_WRITE)
+    journal.record(2, 42, priority=const.PRIORITY_POLL)
+    assert journal.due() == [(2, 42, const.PRIORITY_WRITE, const.REG_MASK_FULL)]
+
+
+def test_due_by_priority_then_age():
+    journal = WriteJournal()
+    journal.record(6, 41, priority=const.PRIORITY_POLL)
+    journal.record(2, 40)
+    journal.record(4, 39)
+    _age(journal, 4, 10)
+    assert [reg for reg, _, _, _ in journal.due()] == [4, 2, 6]
+
+
+def test_too_old_intents_are_dropped():
+    journal = WriteJournal(max_age=60)
+    changes = []
+    journal.set_listener(lambda: changes.append(len(journal)))
+    journal.record(2, 40)
+    journal.record(4, 39)
+    _age(journal, 4, 61)
+    assert journal.due() == [(2, 40, const.PRIORITY_WRITE, const.REG_MASK_FULL)]
+    assert changes == [1, 2, 1]
+
+
+def test_discard_forgets_register():
+    journal = WriteJournal()
+    journal.record(2, 40)
+    journal.discard(2)
+    journal.discard(2)
+    assert len(journal) == 0
+
+
+def test_dump_load_round_trip():
+    journal = WriteJournal()
+    journal.record(1, 0x03, mask=0x0F)
+    journal.record(2, 40)
+    restored = WriteJournal()
+    assert restored.load(journal.dump())
+    assert restored._entries == journal._entries
+
+
+def test_load_entries_saved_without_mask():
+    journal = WriteJournal()
+    assert journal.load([[2, 40, const.PRIORITY_WRITE, 1700000000.0]])
+    assert journal.get(2) == 40
+    assert journal.mask(2) == const.REG_MASK_FULL
+
+
+def test_load_rejects_malformed_journal():
+    journal = WriteJournal()
+    assert not journal.load({"2": 40})
+    assert not journal.load([[2, 40]])
+    assert len(journal) == 0